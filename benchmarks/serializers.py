@@ -0,0 +1,46 @@
+# -*- encoding: utf-8 -*-
+"""
+Compare the JSON serializers on the responses of kofi.
+
+Run with ``python benchmarks/serializers.py``: for every serializer
+installed, it prints the time taken to serialise a single verify response
+and a 10000 items verify batch response, and the speedup over the
+standard library.
+"""
+
+import logging
+import timeit
+import typing as T
+
+from kofi import serializer
+
+SINGLE = {"isCorrect": True, "isOmocode": False, "cf": "RSSMRA99E05H501A"}
+BATCH = [
+    {"isCorrect": i % 3 != 0, "isOmocode": i % 7 == 0, "cf": f"RSSMRA99E05H{i:04d}"}
+    for i in range(10000)
+]
+
+
+def bench(data: T.Any, number: int) -> float:
+    """The mean time to serialise ``data``, in microseconds."""
+    best = min(timeit.repeat(lambda: serializer.dumps(data), number=number, repeat=5))
+    return best / number * 1e6
+
+
+def main() -> None:
+    log = logging.getLogger()
+    results = {}
+    for name in serializer._installed():
+        serializer.setup_serializer(name, log)
+        results[name] = (bench(SINGLE, 100000), bench(BATCH, 20))
+    single_json, batch_json = results["json"]
+    print(f"{'serializer':<10} {'single (us)':>12} {'10k batch (us)':>15}")
+    for name, (single, batch) in results.items():
+        print(
+            f"{name:<10} {single:>7.2f} x{single_json / single:<4.1f}"
+            f"{batch:>10.0f} x{batch_json / batch:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
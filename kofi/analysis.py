@@ -0,0 +1,127 @@
+# -*- encoding: utf-8 -*-
+"""
+Single pass analysis of a codice fiscale.
+
+``codicefiscale.is_valid`` and ``codicefiscale.is_omocode`` each normalise,
+match and checksum the code again, and the latter also builds all of its
+omocode variants. Here the code is parsed once and every facet is derived
+from that single parse, with the same semantics as the library.
+"""
+
+from datetime import date
+import re
+import typing as T
+
+from codicefiscale import codicefiscale
+
+from kofi.validator import (
+    MONTHS,
+    OMOCODIA_LETTERS,
+    OMOCODIA_SUBS_INDEXES,
+    bulk_verify,
+    check_char,
+)
+
+_ALNUM_RE = re.compile(r"^[A-Za-z0-9]+$")
+_CF_RE = codicefiscale.CODICEFISCALE_RE
+_OMOCODIA_DECODE_TRANS = str.maketrans(OMOCODIA_LETTERS, "0123456789")
+
+
+class Analysis(T.NamedTuple):
+    """Every facet of a codice fiscale, as computed by ``analyse``."""
+
+    cf: T.Text
+    is_correct: bool
+    is_omocode: bool
+    canonical: T.Optional[T.Text] = None
+    birth_date: T.Optional[date] = None
+    gender: T.Optional[T.Text] = None
+    birthplace_code: T.Optional[T.Text] = None
+
+
+def _normalise(cf: T.Text) -> T.Text:
+    if _ALNUM_RE.match(cf):
+        return cf.upper()
+    # Anything else goes through the library, that slugifies the code.
+    return codicefiscale.decode_raw(cf)["code"]
+
+
+def _is_omocode(code: T.Text) -> bool:
+    """
+    Whether ``code`` (already known to be valid and normalised) is one
+    of the omocode variants ``codicefiscale.is_omocode`` generates: the
+    last ``k`` substitutable positions must hold letters and the other
+    ones must not hold omocode letters.
+    """
+    for k in range(1, len(OMOCODIA_SUBS_INDEXES) + 1):
+        encoded = OMOCODIA_SUBS_INDEXES[:k]
+        decoded = OMOCODIA_SUBS_INDEXES[k:]
+        if all(not code[i].isdigit() for i in encoded) and all(
+            code[i] not in OMOCODIA_LETTERS for i in decoded
+        ):
+            return True
+    return False
+
+
+def analyse(cf: T.Text) -> Analysis:
+    """Parse ``cf`` once and return all of its facets."""
+    invalid = Analysis(cf, False, False)
+    try:
+        code = _normalise(cf)
+    except ValueError:
+        return invalid
+    if not _CF_RE.match(code):
+        return invalid
+
+    body = code[:15]
+    decoded = (
+        body[:6]
+        + body[6:8].translate(_OMOCODIA_DECODE_TRANS)
+        + body[8]
+        + body[9:11].translate(_OMOCODIA_DECODE_TRANS)
+        + body[11]
+        + body[12:15].translate(_OMOCODIA_DECODE_TRANS)
+    )
+    try:
+        year = int(decoded[6:8])
+        day = int(decoded[9:11])
+    except ValueError:
+        return invalid
+    gender = "M"
+    if day > 40:
+        day -= 40
+        gender = "F"
+    current_year = date.today().year
+    year += current_year - current_year % 100
+    if year > current_year:
+        year -= 100
+    try:
+        birth_date = date(year, MONTHS.index(code[8]) + 1, day)
+    except ValueError:
+        return invalid
+
+    if check_char(body) != code[15]:
+        return invalid
+
+    return Analysis(
+        cf=cf,
+        is_correct=True,
+        # The library compares the omocode variants with the raw input.
+        is_omocode=cf == code and _is_omocode(code),
+        canonical=decoded + check_char(decoded),
+        birth_date=birth_date,
+        gender=gender,
+        birthplace_code=decoded[11:15],
+    )
+
+
+def verify_many(cfs: T.Sequence[T.Text]) -> T.List[T.Tuple[bool, bool]]:
+    """
+    Check many codici fiscali at once, returning for each of them whether
+    it is correct and omocode. The codes are checked in bulk by
+    ``kofi.validator`` where possible, and one by one otherwise.
+    """
+    return [
+        result if result is not None else analyse(cf)[1:3]
+        for cf, result in zip(cfs, bulk_verify(cfs))
+    ]
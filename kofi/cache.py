@@ -0,0 +1,257 @@
+# -*- encoding: utf-8 -*-
+"""
+Caches for the results of the codice fiscale computations.
+
+Each process keeps its own LRU caches. With several workers, the results
+can also be shared by all of them in ``shared_cache``.
+"""
+
+from collections import OrderedDict
+from hashlib import blake2b
+import atexit
+import os
+import struct
+import threading
+import time
+import typing as T
+from zlib import crc32
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # pragma: no cover
+    shared_memory = None  # type: ignore
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    A bounded mapping that evicts the least recently used entry when full
+    and drops entries older than ``ttl`` seconds. A ``size`` of ``0``
+    disables the cache, a ``ttl`` of ``0`` keeps entries until evicted.
+
+    The caches are used by the workers of the thread pool executor too, so
+    every access takes a lock.
+    """
+
+    def __init__(self, size: int, ttl: float = 0) -> None:
+        self._data = OrderedDict()  # type: T.MutableMapping[T.Hashable, T.Any]
+        self._lock = threading.Lock()
+        self.configure(size, ttl)
+
+    def configure(self, size: int, ttl: float = 0) -> None:
+        """Set the cache bounds, emptying it and resetting the counters."""
+        self.size = size
+        self.ttl = ttl
+        self.clear()
+
+    def clear(self) -> None:
+        """Empty the cache and reset the counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+
+    def get(self, key: T.Hashable, default: T.Any = None) -> T.Any:
+        """Return the cached value for ``key``, or ``default``."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at and expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: T.Hashable, value: T.Any) -> None:
+        """Store ``value`` for ``key``, evicting old entries if needed."""
+        if self.size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def items(self) -> T.List[T.Tuple[T.Hashable, T.Any]]:
+        """
+        The entries that have not expired, least recently used first,
+        without counting them as hits.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (key, value)
+                for key, (expires_at, value) in self._data.items()
+                if not expires_at or expires_at >= now
+            ]
+
+    def stats(self) -> T.Dict[T.Text, int]:
+        """The usage counters of the cache."""
+        return {
+            "size": self.size,
+            "entries": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SharedCache:
+    """
+    A fixed-size hash table in shared memory, created before forking the
+    workers, that inherit it. Keys are hashed to a 16 bytes digest, values
+    are up to 16 bytes long and the table holds ``size`` of them.
+
+    Collisions are resolved by linear probing, over at most ``PROBES``
+    slots, after which the entry in the first slot is overwritten. Entries
+    never expire, as the results never change. Neither reads nor writes
+    take locks: each slot is written at once with a checksum, and a slot
+    whose checksum does not match, being empty or torn by concurrent
+    writes, is a miss. The ``hits``, ``misses`` and ``evictions`` are
+    counted per process, the ``entries`` by all of them, approximately.
+    """
+
+    SLOT = struct.Struct("<I16s16s")
+    HEADER = struct.Struct("<Q")
+    PROBES = 4
+
+    def __init__(self) -> None:
+        self._shm = None  # type: T.Optional[T.Any]
+        self._creator = 0
+        self.size = 0
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def configure(self, size: int) -> None:
+        """
+        Create the table of ``size`` slots, unless it already exists,
+        and reset the counters. A ``size`` of ``0`` disables the cache.
+        """
+        self.hits = self.misses = self.evictions = 0
+        if self._shm is not None and size == self.size:
+            return
+        self.close()
+        if size:
+            self._shm = shared_memory.SharedMemory(
+                create=True, size=self.HEADER.size + size * self.SLOT.size
+            )
+            self._creator = os.getpid()
+            self.size = size
+
+    def close(self) -> None:
+        """Detach from the table, destroying it in the process creating it."""
+        if self._shm is None:
+            return
+        self._shm.close()
+        if os.getpid() == self._creator:
+            self._shm.unlink()
+        self._shm = None
+        self.size = 0
+
+    def _digest(self, kind: bytes, key: T.Sequence[T.Text]) -> bytes:
+        digest = blake2b(digest_size=16, person=kind)
+        for part in key:
+            if not isinstance(part, str):
+                raise TypeError(f"Invalid key: {key}")
+            data = part.encode("utf-8")
+            digest.update(len(data).to_bytes(4, "little"))
+            digest.update(data)
+        return digest.digest()
+
+    def _slots(self, digest: bytes) -> T.Iterator[T.Tuple[int, bool, bytes, bytes]]:
+        """The offset, validity, digest and value of the slots to probe."""
+        index = int.from_bytes(digest[:8], "little")
+        for probe in range(self.PROBES):
+            offset = self.HEADER.size + (index + probe) % self.size * self.SLOT.size
+            check, slot_digest, value = self.SLOT.unpack_from(self._shm.buf, offset)
+            yield offset, check == crc32(slot_digest + value), slot_digest, value
+
+    def get(self, kind: bytes, key: T.Sequence[T.Text]) -> T.Optional[bytes]:
+        """The value stored for the ``kind`` of result identified by ``key``."""
+        if not self.size:
+            return None
+        digest = self._digest(kind, key)
+        for _, valid, slot_digest, value in self._slots(digest):
+            if not valid:
+                break
+            if slot_digest == digest:
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, kind: bytes, key: T.Sequence[T.Text], value: bytes) -> None:
+        """Store ``value``, padded to 16 bytes, for ``key``."""
+        if not self.size:
+            return
+        digest = self._digest(kind, key)
+        value = value.ljust(16, b"\0")
+        for offset, valid, slot_digest, _ in self._slots(digest):
+            if not valid or slot_digest == digest:
+                break
+        else:
+            # All of the slots are taken: the first one is overwritten.
+            offset, valid, _, _ = next(self._slots(digest))
+            self.evictions += 1
+        self.SLOT.pack_into(self._shm.buf, offset, crc32(digest + value), digest, value)
+        if not valid:
+            (entries,) = self.HEADER.unpack_from(self._shm.buf, 0)
+            self.HEADER.pack_into(self._shm.buf, 0, entries + 1)
+
+    def stats(self) -> T.Dict[T.Text, int]:
+        """The usage counters of the cache."""
+        return {
+            "size": self.size,
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def __len__(self) -> int:
+        if not self.size:
+            return 0
+        return self.HEADER.unpack_from(self._shm.buf, 0)[0]
+
+
+verify_cache = LRUCache(0)
+interpolate_cache = LRUCache(0)
+document_cache = LRUCache(0)
+shared_cache = SharedCache()
+atexit.register(shared_cache.close)
+
+
+def setup_cache(config: T.Dict[T.Text, T.Any]) -> T.Dict[T.Text, LRUCache]:
+    """
+    Setup the result caches shared by the REST and GraphQL APIs, and the
+    cache of the parsed GraphQL documents. The schema does not change, so
+    documents do not expire. The cache shared by the workers is reported
+    only when enabled.
+    """
+    verify_cache.configure(config["size"], config["ttl"])
+    interpolate_cache.configure(config["size"], config["ttl"])
+    document_cache.configure(config["documents"])
+    shared_cache.configure(config["shared"])
+    caches = {
+        "verify": verify_cache,
+        "interpolate": interpolate_cache,
+        "documents": document_cache,
+    }  # type: T.Dict[T.Text, T.Any]
+    if shared_cache.size:
+        caches["shared"] = shared_cache
+    return caches
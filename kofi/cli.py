@@ -1,14 +1,18 @@
 # -*- encoding: utf-8 -*-
 """Console script for kofi."""
+from json import dumps
 import sys
 from pprint import pformat
 import typing as T
 
 import click
 
+from kofi.codes import verify_many
 from kofi.config import read_config, merge_configs, VALIDATE
 from kofi.main import run_from_shell
 
+VERIFY_CHUNK_SIZE = 100000
+
 
 def _validate(ctx: click.Context, param: T.Text, value: T.Any) -> None:
     if value is not None:
@@ -26,6 +30,41 @@ def _validate_port(ctx, param, value):
     _validate(ctx, "port", value)
 
 
+def _validate_unix_socket(ctx, param, value):
+    _validate(ctx, "unix_socket", value)
+
+
+def _validate_workers(ctx, param, value):
+    _validate(ctx, "workers", value)
+
+
+def _verify_file(in_file: T.TextIO, out_file: T.TextIO) -> None:
+    """
+    Verify the codici fiscali in ``in_file``, one per line, writing one
+    verify object per line to ``out_file``. The codes are checked in
+    chunks through the bulk validator.
+    """
+    chunk = []  # type: T.List[T.Text]
+    for line in in_file:
+        cf = line.strip()
+        if cf:
+            chunk.append(cf)
+        if len(chunk) == VERIFY_CHUNK_SIZE:
+            _write_verified(chunk, out_file)
+            chunk = []
+    if chunk:
+        _write_verified(chunk, out_file)
+
+
+def _write_verified(cfs: T.List[T.Text], out_file: T.TextIO) -> None:
+    out_file.write(
+        "".join(
+            dumps({"isCorrect": is_correct, "isOmocode": is_omocode, "cf": cf}) + "\n"
+            for cf, (is_correct, is_omocode) in zip(cfs, verify_many(cfs))
+        )
+    )
+
+
 @click.command()
 @click.option("-c", "--config", "config_path", help="The path to the config file.")
 @click.option(
@@ -43,6 +82,27 @@ def _validate_port(ctx, param, value):
     help="The port to bind kofi to.",
     callback=_validate_port,
 )
+@click.option(
+    "-u",
+    "--unix-socket",
+    "unix_socket",
+    help="The unix socket to bind kofi to, instead of address and port.",
+    callback=_validate_unix_socket,
+)
+@click.option(
+    "--loop",
+    "loop",
+    help="The event loop implementation.",
+    type=click.Choice(["asyncio", "uvloop"]),
+)
+@click.option(
+    "-w",
+    "--workers",
+    "workers",
+    type=click.INT,
+    help="The number of worker processes.",
+    callback=_validate_workers,
+)
 @click.option(
     "-l",
     "--log-level",
@@ -60,23 +120,43 @@ def _validate_port(ctx, param, value):
 @click.option(
     "--graphiql", "graphiql", help="Enable the graphiql facility", is_flag=True
 )
+@click.option(
+    "--verify",
+    "verify_file",
+    help="Verify the codici fiscali in the file (one per line, - for stdin) and exit.",
+    type=click.File("r"),
+)
 @click.pass_context
 def main(
     ctx: click.Context,
     config_path: T.Optional[T.Text],
     host: T.Text,
     port: int,
+    unix_socket: T.Optional[T.Text],
+    loop: T.Optional[T.Text],
+    workers: int,
     log_level: T.Text,
     syslog: bool,
     log_file: T.Optional[T.Text],
     graphiql: bool,
+    verify_file: T.Optional[T.TextIO],
 ):
     """Console script for kofi."""
+    if verify_file is not None:
+        _verify_file(verify_file, sys.stdout)
+        return
+
     shell_config = {}  # type: T.Dict[T.Text, T.Any]
     if host:
         shell_config["host"] = host
     if port:
         shell_config["port"] = port
+    if unix_socket:
+        shell_config["unix_socket"] = unix_socket
+    if loop:
+        shell_config["loop"] = loop
+    if workers:
+        shell_config["workers"] = workers
     log_conf = {
         "level": log_level,
         "syslog": syslog,
@@ -0,0 +1,109 @@
+# -*- encoding: utf-8 -*-
+"""The codice fiscale computations shared by the REST and GraphQL APIs."""
+
+import typing as T
+
+from codicefiscale import codicefiscale
+
+from kofi import analysis
+from kofi.analysis import Analysis
+from kofi import places
+from kofi.cache import interpolate_cache, shared_cache, verify_cache
+
+# The kinds of results in the cache shared by the workers.
+VERIFY = b"verify"
+INTERPOLATE = b"interpolate"
+
+
+def _analyse(cf: T.Text) -> Analysis:
+    """Analyse a codice fiscale, filling the verify and the shared caches."""
+    result = analysis.analyse(cf)
+    verify_cache.set(cf, result)
+    shared_cache.set(VERIFY, (cf,), bytes((result.is_correct, result.is_omocode)))
+    return result
+
+
+def analyse(cf: T.Text) -> Analysis:
+    """
+    Analyse a codice fiscale, going through the verify cache. The cache
+    shared by the workers only holds the verify flags, so it cannot
+    answer, but it is filled for them.
+    """
+    result = verify_cache.get(cf)
+    if result is None:
+        result = _analyse(cf)
+    return result
+
+
+def verify(cf: T.Text) -> T.Tuple[bool, bool]:
+    """
+    Check a codice fiscale, returning whether it is correct and omocode,
+    going through the verify cache, then the cache shared by the workers.
+    """
+    result = verify_cache.get(cf)
+    if result is None:
+        flags = shared_cache.get(VERIFY, (cf,))
+        if flags is not None:
+            return bool(flags[0]), bool(flags[1])
+        result = _analyse(cf)
+    return result.is_correct, result.is_omocode
+
+
+def verify_many(cfs: T.Sequence[T.Text]) -> T.List[T.Tuple[bool, bool]]:
+    """
+    Check many codici fiscali at once. Bulk checks bypass the verify
+    cache, so that a large batch does not evict the hot entries.
+    """
+    return analysis.verify_many(cfs)
+
+
+def resolve_place(place_of_birth: T.Text) -> T.Text:
+    """
+    The code of a place of birth, through the index of ``kofi.places``.
+    Raises ``ValueError`` if it is unknown.
+    """
+    return places.birthplaces.resolve(place_of_birth)
+
+
+def encode(
+    surname: T.Text,
+    name: T.Text,
+    gender: T.Text,
+    date_of_birth: T.Text,
+    birthplace_code: T.Text,
+) -> T.Text:
+    """
+    Build a codice fiscale from personal data and the code of the place of
+    birth, as resolved by ``resolve_place`` or ``match_place``. Raises
+    ``ValueError`` on invalid data, as ``codicefiscale.encode`` does, and
+    on dates too large for ``dateutil``, which raises ``OverflowError``.
+    """
+    key = (surname, name, gender, date_of_birth, birthplace_code)
+    cf = interpolate_cache.get(key)
+    if cf is not None:
+        return cf
+    shared = shared_cache.get(INTERPOLATE, key)
+    if shared is not None:
+        cf = shared.rstrip(b"\0").decode("ascii")
+        interpolate_cache.set(key, cf)
+        return cf
+    try:
+        birthdate = codicefiscale.encode_birthdate(date_of_birth, gender)
+    except OverflowError as e:
+        raise ValueError(f"[codicefiscale] {e}: {date_of_birth}") from e
+    code = (
+        codicefiscale.encode_surname(surname)
+        + codicefiscale.encode_name(name)
+        + birthdate
+    )
+    code += birthplace_code
+    code += codicefiscale.encode_cin(code)
+    cf = codicefiscale.decode(code)["code"]
+    interpolate_cache.set(key, cf)
+    shared_cache.set(INTERPOLATE, key, cf.encode("ascii"))
+    return cf
+
+
+def match_place(place_of_birth: T.Text) -> places.Match:
+    """Match a misspelt place of birth with the most similar known one."""
+    return places.birthplaces.match(place_of_birth)
@@ -0,0 +1,57 @@
+# -*- encoding: utf-8 -*-
+"""
+HTTP caching of the responses depending only on the request.
+
+The results of verify and interpolate, and of the persisted GraphQL
+queries sent with a GET request, depend only on the request and on the
+dataset bundled with python-codicefiscale. Their responses carry a strong
+``ETag``, hashed from those inputs, and a ``Cache-Control`` header, so
+that CDNs and clients can cache them. As the tag is known before the
+response is computed, a request with a matching ``If-None-Match`` is
+answered ``304 Not Modified`` without computing it.
+
+The tag also changes with the version of kofi and with the serializer,
+that shape the bytes of the response.
+"""
+
+from hashlib import blake2b
+import typing as T
+
+from aiohttp import web
+from codicefiscale.version import __version__ as codicefiscale_version
+
+from kofi import __version__
+
+
+def etag(serializer: T.Text, *key: T.Any) -> T.Text:
+    """The strong ETag of the response identified by ``key``."""
+    data = repr((__version__, codicefiscale_version, serializer) + key)
+    return f'"{blake2b(data.encode(), digest_size=16).hexdigest()}"'
+
+
+def is_fresh(request: web.Request, tag: T.Text) -> bool:
+    """
+    Whether the client already has the response tagged ``tag``, as
+    ``If-None-Match`` is compared with the weak comparison. The tag is
+    known before the request is validated, so ``*`` is not honoured: it
+    would answer ``304`` to the requests that fail.
+    """
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    tags = {candidate.strip() for candidate in header.split(",")}
+    return tag in tags or f"W/{tag}" in tags
+
+
+def cache_headers(tag: T.Text, max_age: int) -> T.Dict[T.Text, T.Text]:
+    """
+    The ``ETag`` and ``Cache-Control`` headers. A ``max_age`` of ``0``
+    makes caches revalidate the response every time.
+    """
+    cache_control = f"public, max-age={max_age}" if max_age else "no-cache"
+    return {"ETag": tag, "Cache-Control": cache_control}
+
+
+def not_modified(tag: T.Text, max_age: int) -> web.Response:
+    """The ``304 Not Modified`` response, with the caching headers."""
+    return web.Response(status=304, headers=cache_headers(tag, max_age))
@@ -11,6 +11,11 @@ import typing as T
 
 import yaml
 
+from kofi.cache import shared_memory
+from kofi.executor import MODES
+from kofi.loop import LOOPS
+from kofi.serializer import SERIALIZERS
+
 
 def merge_configs(
     config: T.Dict[T.Text, T.Any], shell_config: T.Dict[T.Text, T.Any]
@@ -89,6 +94,27 @@ def _validate_port(port: int) -> int:
     raise ValueError(f"'port' is invalid in configuration: {port}")
 
 
+def _validate_unix_socket(unix_socket: T.Text) -> T.Text:
+    if not isinstance(unix_socket, str) or not os.path.isdir(
+        os.path.dirname(os.path.abspath(unix_socket))
+    ):
+        raise ValueError(
+            f"'unix_socket' is invalid in configuration: {unix_socket}\
+                Base directory does not exist."
+        )
+    return unix_socket
+
+
+def _validate_loop(loop: T.Text) -> T.Text:
+    if loop in LOOPS:
+        return loop
+
+    raise ValueError(
+        f"'loop' is invalid in configuration: {loop}\
+            Allowed values are {LOOPS}"
+    )
+
+
 def _validate_log(log_conf: T.Dict[T.Text, T.Any]) -> T.Dict[T.Text, T.Any]:
     log_level = log_conf.get("level", DEFAULT_LOG_CONF["level"]).upper()
     if log_level not in ["DEBUG", "INFO", "WARNING", "ERROR"]:
@@ -111,6 +137,18 @@ def _validate_log(log_conf: T.Dict[T.Text, T.Any]) -> T.Dict[T.Text, T.Any]:
                     Base directory does not exist."
             )
         conf["log_file"] = log_file
+    queue_size = log_conf.get("queue_size")
+    if queue_size is not None:
+        if (
+            not isinstance(queue_size, int)
+            or isinstance(queue_size, bool)
+            or queue_size < 1
+        ):
+            raise ValueError(
+                f"'queue_size' is invalid in configuration: {queue_size}\
+                    It must be a positive integer"
+            )
+        conf["queue_size"] = queue_size
 
     return conf
 
@@ -123,6 +161,237 @@ def _validate_graphiql(graphiql_conf: T.Optional[bool]) -> bool:
     raise ValueError(f"'graphiql' is invalid in configuration: {graphiql_conf}")
 
 
+def _validate_max_batch_size(max_batch_size: int) -> int:
+    if (
+        isinstance(max_batch_size, int)
+        and not isinstance(max_batch_size, bool)
+        and max_batch_size > 0
+    ):
+        return max_batch_size
+
+    raise ValueError(
+        f"'max_batch_size' is invalid in configuration: {max_batch_size}\
+            It must be a positive integer"
+    )
+
+
+def _validate_serializer(serializer_conf: T.Text) -> T.Text:
+    if serializer_conf not in SERIALIZERS:
+        raise ValueError(
+            f"'serializer' is invalid in configuration: {serializer_conf}\
+                Allowed values are {SERIALIZERS}"
+        )
+    return serializer_conf
+
+
+def _validate_workers(workers: int) -> int:
+    if isinstance(workers, int) and not isinstance(workers, bool) and workers > 0:
+        return workers
+
+    raise ValueError(
+        f"'workers' is invalid in configuration: {workers}\
+            It must be a positive integer"
+    )
+
+
+def _validate_cache(cache_conf: T.Dict[T.Text, T.Any]) -> T.Dict[T.Text, T.Any]:
+    size = cache_conf.get("size", DEFAULT_CACHE_CONF["size"])
+    if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+        raise ValueError(
+            f"'size' is invalid in configuration: {size}\
+                It must be a non negative integer"
+        )
+    ttl = cache_conf.get("ttl", DEFAULT_CACHE_CONF["ttl"])
+    if not isinstance(ttl, (int, float)) or isinstance(ttl, bool) or ttl < 0:
+        raise ValueError(
+            f"'ttl' is invalid in configuration: {ttl}\
+                It must be a non negative number of seconds"
+        )
+    documents = cache_conf.get("documents", DEFAULT_CACHE_CONF["documents"])
+    if not isinstance(documents, int) or isinstance(documents, bool) or documents < 0:
+        raise ValueError(
+            f"'documents' is invalid in configuration: {documents}\
+                It must be a non negative integer"
+        )
+
+    shared = cache_conf.get("shared", DEFAULT_CACHE_CONF["shared"])
+    if not isinstance(shared, int) or isinstance(shared, bool) or shared < 0:
+        raise ValueError(
+            f"'shared' is invalid in configuration: {shared}\
+                It must be a non negative integer"
+        )
+    if shared and shared_memory is None:
+        raise ValueError(
+            f"'shared' is invalid in configuration: {shared}\
+                Shared memory requires Python 3.8"
+        )
+
+    snapshot_path = cache_conf.get("snapshot_path", DEFAULT_CACHE_CONF["snapshot_path"])
+    if snapshot_path is not None and (
+        not isinstance(snapshot_path, str)
+        or not os.path.isdir(os.path.dirname(os.path.abspath(snapshot_path)))
+    ):
+        raise ValueError(
+            f"'snapshot_path' is invalid in configuration: {snapshot_path}\
+                Base directory does not exist."
+        )
+    snapshot_interval = cache_conf.get(
+        "snapshot_interval", DEFAULT_CACHE_CONF["snapshot_interval"]
+    )
+    if (
+        not isinstance(snapshot_interval, (int, float))
+        or isinstance(snapshot_interval, bool)
+        or snapshot_interval <= 0
+    ):
+        raise ValueError(
+            f"'snapshot_interval' is invalid in configuration: {snapshot_interval}\
+                It must be a positive number of seconds"
+        )
+
+    return {
+        "size": size,
+        "ttl": ttl,
+        "documents": documents,
+        "shared": shared,
+        "snapshot_path": snapshot_path,
+        "snapshot_interval": snapshot_interval,
+    }
+
+
+def _validate_executor(executor_conf: T.Dict[T.Text, T.Any]) -> T.Dict[T.Text, T.Any]:
+    mode = executor_conf.get("mode", DEFAULT_EXECUTOR_CONF["mode"])
+    if mode not in MODES:
+        raise ValueError(
+            f"'mode' is invalid in configuration: {mode}\
+                Allowed values are {MODES}"
+        )
+    max_workers = executor_conf.get("max_workers", DEFAULT_EXECUTOR_CONF["max_workers"])
+    if (
+        not isinstance(max_workers, int)
+        or isinstance(max_workers, bool)
+        or max_workers < 0
+    ):
+        raise ValueError(
+            f"'max_workers' is invalid in configuration: {max_workers}\
+                It must be a non negative integer"
+        )
+
+    return {"mode": mode, "max_workers": max_workers}
+
+
+def _validate_persisted_queries(
+    persisted_conf: T.Dict[T.Text, T.Any]
+) -> T.Dict[T.Text, T.Any]:
+    conf = {}
+    queries_file = persisted_conf.get("file", DEFAULT_PERSISTED_QUERIES_CONF["file"])
+    if queries_file is not None and not os.path.isfile(queries_file):
+        raise ValueError(
+            f"'file' is invalid in configuration: {queries_file}\
+                File does not exist."
+        )
+    conf["file"] = queries_file
+    register = persisted_conf.get(
+        "register", DEFAULT_PERSISTED_QUERIES_CONF["register"]
+    )
+    if not isinstance(register, bool):
+        raise ValueError(
+            f"'register' is invalid in configuration: {register}\
+                Allowed values are ('true', 'false')"
+        )
+    conf["register"] = register
+    size = persisted_conf.get("size", DEFAULT_PERSISTED_QUERIES_CONF["size"])
+    if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+        raise ValueError(
+            f"'size' is invalid in configuration: {size}\
+                It must be a non negative integer"
+        )
+    conf["size"] = size
+
+    return conf
+
+
+def _validate_query_limits(limits_conf: T.Dict[T.Text, T.Any]) -> T.Dict[T.Text, int]:
+    conf = {}
+    for key, default in DEFAULT_QUERY_LIMITS_CONF.items():
+        value = limits_conf.get(key, default)
+        if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+            raise ValueError(
+                f"'{key}' is invalid in configuration: {value}\
+                It must be a positive integer"
+            )
+        conf[key] = value
+
+    return conf
+
+
+def _validate_metrics(metrics_conf: T.Dict[T.Text, T.Any]) -> T.Dict[T.Text, T.Any]:
+    enabled = metrics_conf.get("enabled", DEFAULT_METRICS_CONF["enabled"])
+    if not isinstance(enabled, bool):
+        raise ValueError(
+            f"'enabled' is invalid in configuration: {enabled}\
+                Allowed values are ('true', 'false')"
+        )
+    buckets = metrics_conf.get("buckets", DEFAULT_METRICS_CONF["buckets"])
+    if (
+        not isinstance(buckets, list)
+        or not buckets
+        or not all(
+            isinstance(b, (int, float)) and not isinstance(b, bool) and b > 0
+            for b in buckets
+        )
+    ):
+        raise ValueError(
+            f"'buckets' is invalid in configuration: {buckets}\
+                It must be a list of positive numbers of seconds"
+        )
+
+    return {"enabled": enabled, "buckets": sorted(buckets)}
+
+
+def _validate_server_timing(
+    timing_conf: T.Dict[T.Text, T.Any]
+) -> T.Dict[T.Text, T.Any]:
+    enabled = timing_conf.get("enabled", DEFAULT_SERVER_TIMING_CONF["enabled"])
+    if not isinstance(enabled, bool):
+        raise ValueError(
+            f"'enabled' is invalid in configuration: {enabled}\
+                Allowed values are ('true', 'false')"
+        )
+    sample_percent = timing_conf.get(
+        "sample_percent", DEFAULT_SERVER_TIMING_CONF["sample_percent"]
+    )
+    if (
+        not isinstance(sample_percent, (int, float))
+        or isinstance(sample_percent, bool)
+        or not 0 <= sample_percent <= 100
+    ):
+        raise ValueError(
+            f"'sample_percent' is invalid in configuration: {sample_percent}\
+                It must be a number between 0 and 100"
+        )
+
+    return {"enabled": enabled, "sample_percent": sample_percent}
+
+
+def _validate_http_cache(
+    http_cache_conf: T.Dict[T.Text, T.Any]
+) -> T.Dict[T.Text, T.Any]:
+    enabled = http_cache_conf.get("enabled", DEFAULT_HTTP_CACHE_CONF["enabled"])
+    if not isinstance(enabled, bool):
+        raise ValueError(
+            f"'enabled' is invalid in configuration: {enabled}\
+                Allowed values are ('true', 'false')"
+        )
+    max_age = http_cache_conf.get("max_age", DEFAULT_HTTP_CACHE_CONF["max_age"])
+    if not isinstance(max_age, int) or isinstance(max_age, bool) or max_age < 0:
+        raise ValueError(
+            f"'max_age' is invalid in configuration: {max_age}\
+                It must be a non negative number of seconds"
+        )
+
+    return {"enabled": enabled, "max_age": max_age}
+
+
 DEFAULT_CONF_PATH = [
     os.path.join(os.path.curdir, "kofi.yml"),
     os.path.join(pathlib.Path.home(), "kofi.yml"),
@@ -130,11 +399,62 @@ DEFAULT_CONF_PATH = [
 ]
 
 DEFAULT_LOG_CONF = {"level": "ERROR", "syslog": False}
-DEFAULT = {"host": "0.0.0.0", "port": 1312, "log": DEFAULT_LOG_CONF, "graphiql": False}
+DEFAULT_CACHE_CONF = {
+    "size": 10000,
+    "ttl": 3600,
+    "documents": 1000,
+    "shared": 0,
+    "snapshot_path": None,
+    "snapshot_interval": 300,
+}
+DEFAULT_PERSISTED_QUERIES_CONF = {"file": None, "register": True, "size": 1000}
+DEFAULT_EXECUTOR_CONF = {"mode": "inline", "max_workers": 0}
+DEFAULT_QUERY_LIMITS_CONF = {
+    "max_cost": 1000,
+    "max_depth": 10,
+    "max_aliases": 100,
+    "max_operations": 10,
+}
+DEFAULT_METRICS_CONF = {
+    "enabled": True,
+    "buckets": [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1],
+}
+DEFAULT_SERVER_TIMING_CONF = {"enabled": False, "sample_percent": 100}
+DEFAULT_HTTP_CACHE_CONF = {"enabled": True, "max_age": 3600}
+DEFAULT = {
+    "host": "0.0.0.0",
+    "port": 1312,
+    "unix_socket": None,
+    "loop": "asyncio",
+    "log": DEFAULT_LOG_CONF,
+    "graphiql": False,
+    "max_batch_size": 10000,
+    "workers": 1,
+    "serializer": "auto",
+    "cache": DEFAULT_CACHE_CONF,
+    "executor": DEFAULT_EXECUTOR_CONF,
+    "persisted_queries": DEFAULT_PERSISTED_QUERIES_CONF,
+    "query_limits": DEFAULT_QUERY_LIMITS_CONF,
+    "metrics": DEFAULT_METRICS_CONF,
+    "server_timing": DEFAULT_SERVER_TIMING_CONF,
+    "http_cache": DEFAULT_HTTP_CACHE_CONF,
+}
 
 VALIDATE = {
     "host": _validate_host,
     "port": _validate_port,
+    "unix_socket": _validate_unix_socket,
+    "loop": _validate_loop,
     "log": _validate_log,
     "graphiql": _validate_graphiql,
+    "max_batch_size": _validate_max_batch_size,
+    "workers": _validate_workers,
+    "serializer": _validate_serializer,
+    "cache": _validate_cache,
+    "executor": _validate_executor,
+    "persisted_queries": _validate_persisted_queries,
+    "query_limits": _validate_query_limits,
+    "metrics": _validate_metrics,
+    "server_timing": _validate_server_timing,
+    "http_cache": _validate_http_cache,
 }
@@ -0,0 +1,172 @@
+# -*- encoding: utf-8 -*-
+"""
+Static cost analysis of the GraphQL documents.
+
+Every operation of a document is measured before it is executed: its
+cost, summing the cost of every field it selects, the depth of its
+selections and the number of aliased fields. Fields cost ``1`` unless
+listed in ``FIELD_COSTS``, and the cost of the items of a list field is
+multiplied by the number of items it can return. Introspection fields
+are counted as any other, but their depth is checked against the fixed
+``INTROSPECTION_MAX_DEPTH`` instead of the configured one, so that tools
+like graphiql keep working.
+
+The operations sent in a batch are also checked together: their costs
+and aliases add up against the same limits.
+"""
+
+import typing as T
+
+from graphql.language import ast
+
+from kofi.places import DEFAULT_LIMIT, MAX_LIMIT
+
+DEFAULT_FIELD_COST = 1
+FIELD_COSTS = {"interpolate": 10, "places": 2}
+# The argument bounding the number of items of list fields, with its
+# default and maximum values.
+LIST_SIZES = {"places": ("limit", DEFAULT_LIMIT, MAX_LIMIT)}
+INTROSPECTION_FIELDS = {"__schema", "__type"}
+# The depth of the introspection query sent by graphiql.
+INTROSPECTION_MAX_DEPTH = 13
+
+
+class Cost(T.NamedTuple):
+    """The measures of an operation checked against the limits."""
+
+    cost: int
+    depth: int
+    aliases: int
+    introspection_depth: int = 0
+
+
+def _list_size(field: ast.Field) -> int:
+    """How many items a list field can return, 1 for the other fields."""
+    if field.name.value not in LIST_SIZES:
+        return 1
+    name, default, maximum = LIST_SIZES[field.name.value]
+    for argument in field.arguments or ():
+        if argument.name.value == name:
+            if isinstance(argument.value, ast.IntValue):
+                return min(int(argument.value.value), maximum)
+            # Variables are not known until execution.
+            return maximum
+    return default
+
+
+def _measure(
+    selection_set: T.Optional[ast.SelectionSet],
+    fragments: T.Dict[T.Text, ast.FragmentDefinition],
+    depth: int,
+) -> Cost:
+    cost = aliases = 0
+    max_depth = depth
+    introspection_depth = 0
+    if selection_set is None:
+        return Cost(cost, max_depth, aliases)
+    for selection in selection_set.selections:
+        if isinstance(selection, ast.Field):
+            name = selection.name.value
+            inner = _measure(selection.selection_set, fragments, depth + 1)
+            cost += FIELD_COSTS.get(name, DEFAULT_FIELD_COST)
+            cost += _list_size(selection) * inner.cost
+            aliases += inner.aliases + (selection.alias is not None)
+            if name in INTROSPECTION_FIELDS:
+                introspection_depth = max(introspection_depth, inner.depth)
+            else:
+                max_depth = max(max_depth, inner.depth)
+                introspection_depth = max(
+                    introspection_depth, inner.introspection_depth
+                )
+            continue
+        if isinstance(selection, ast.FragmentSpread):
+            inner_selection_set = fragments[selection.name.value].selection_set
+        else:
+            inner_selection_set = selection.selection_set
+        inner = _measure(inner_selection_set, fragments, depth)
+        cost += inner.cost
+        aliases += inner.aliases
+        max_depth = max(max_depth, inner.depth)
+        introspection_depth = max(introspection_depth, inner.introspection_depth)
+    return Cost(cost, max_depth, aliases, introspection_depth)
+
+
+def measure(document_ast: ast.Document) -> T.Dict[T.Optional[T.Text], Cost]:
+    """
+    The cost of every operation of a valid document, by operation name.
+    An anonymous operation is found under ``None``.
+    """
+    fragments = {
+        definition.name.value: definition
+        for definition in document_ast.definitions
+        if isinstance(definition, ast.FragmentDefinition)
+    }
+    return {
+        definition.name.value
+        if definition.name
+        else None: _measure(definition.selection_set, fragments, 0)
+        for definition in document_ast.definitions
+        if isinstance(definition, ast.OperationDefinition)
+    }
+
+
+def select(
+    costs: T.Dict[T.Optional[T.Text], Cost], operation_name: T.Optional[T.Text]
+) -> T.Optional[Cost]:
+    """The cost of the operation ``operation_name``, ``None`` if unknown."""
+    if operation_name is None and len(costs) == 1:
+        operation_name = next(iter(costs))
+    return costs.get(operation_name)
+
+
+def _exceeds(
+    cost: Cost, limits: T.Dict[T.Text, int], subject: T.Text
+) -> T.Optional[T.Text]:
+    if cost.aliases > limits["max_aliases"]:
+        return (
+            f"{subject} aliases {cost.aliases} exceed the maximum of "
+            f"{limits['max_aliases']}"
+        )
+    if cost.cost > limits["max_cost"]:
+        return f"{subject} cost {cost.cost} exceeds the maximum of {limits['max_cost']}"
+    return None
+
+
+def check(
+    costs: T.Dict[T.Optional[T.Text], Cost],
+    operation_name: T.Optional[T.Text],
+    limits: T.Dict[T.Text, int],
+) -> T.Optional[T.Text]:
+    """
+    The reason why the operation ``operation_name`` exceeds ``limits``,
+    or ``None`` if it does not. Unknown operations are left to the
+    executor to report.
+    """
+    cost = select(costs, operation_name)
+    if cost is None:
+        return None
+    if cost.depth > limits["max_depth"]:
+        return f"Query depth {cost.depth} exceeds the maximum of {limits['max_depth']}"
+    if cost.introspection_depth > INTROSPECTION_MAX_DEPTH:
+        return (
+            f"Introspection depth {cost.introspection_depth} exceeds the maximum "
+            f"of {INTROSPECTION_MAX_DEPTH}"
+        )
+    return _exceeds(cost, limits, "Query")
+
+
+def check_batch(
+    costs: T.Iterable[Cost], limits: T.Dict[T.Text, int]
+) -> T.Optional[T.Text]:
+    """
+    The reason why the operations of a batch, with ``costs``, exceed
+    ``limits`` together, or ``None`` if they do not. The depth is checked
+    on each operation by ``check``.
+    """
+    costs = list(costs)
+    total = Cost(
+        sum(cost.cost for cost in costs),
+        max((cost.depth for cost in costs), default=0),
+        sum(cost.aliases for cost in costs),
+    )
+    return _exceeds(total, limits, "Batch")
@@ -0,0 +1,181 @@
+# -*- encoding: utf-8 -*-
+"""
+The GraphQL documents, parsed and validated once.
+
+The default graphql-core backend parses every query string it receives
+and validates it again against the schema on every execution. The
+backend defined here keeps the parsed document and the outcome of its
+validation in ``kofi.cache.document_cache``, so that the queries clients
+send over and over go straight to execution. The cost of the operations
+of a document is measured along with its validation, so that those over
+the configured limits are rejected before any resolver runs.
+
+Clients can also send the SHA-256 hash of a query instead of its text,
+as in the automatic persisted queries protocol: ``PersistedQueries`` maps
+the hashes to the queries loaded from a file at startup and to the ones
+registered by the clients, once validated against the schema.
+"""
+
+from functools import partial
+from hashlib import sha256
+import json
+import typing as T
+
+from graphql import GraphQLError, GraphQLSchema, parse, validate
+from graphql.backend import GraphQLBackend, GraphQLDocument
+from graphql.execution import ExecutionResult, execute
+from graphql.language.ast import Document
+
+from kofi.cache import LRUCache, document_cache
+from kofi.cost import Cost, check, measure, select
+from kofi.timing import phase
+
+
+def _execute(
+    schema: GraphQLSchema,
+    document_ast: Document,
+    errors: T.List[Exception],
+    costs: T.Dict[T.Optional[T.Text], Cost],
+    limits: T.Optional[T.Dict[T.Text, int]],
+    *args: T.Any,
+    **kwargs: T.Any,
+) -> T.Any:
+    """
+    Execute an already validated document, unless it is invalid or the
+    operation to run exceeds ``limits``.
+    """
+    if errors:
+        return ExecutionResult(errors=errors, invalid=True)
+    if limits is not None:
+        reason = check(costs, kwargs.get("operation_name"), limits)
+        if reason is not None:
+            return ExecutionResult(errors=[GraphQLError(reason)], invalid=True)
+    return execute(schema, document_ast, *args, **kwargs)
+
+
+class CachedBackend(GraphQLBackend):
+    """
+    A graphql-core backend that parses and validates each query string
+    once. The cache is keyed by the query text: the operation to run is
+    chosen at execution time, so all of the operations of a document
+    share its entry. Syntax errors are raised and not cached.
+
+    With ``limits``, the operations whose ``max_cost``, ``max_depth`` or
+    ``max_aliases`` are exceeded are not executed.
+    """
+
+    def __init__(self, limits: T.Optional[T.Dict[T.Text, int]] = None) -> None:
+        self.limits = limits
+
+    def _cached(
+        self, schema: GraphQLSchema, document_string: T.Text
+    ) -> T.Tuple[Document, T.List[Exception], T.Dict[T.Optional[T.Text], Cost]]:
+        key = (schema, document_string)
+        with phase("parse"):
+            analysis = document_cache.get(key)
+            if analysis is None:
+                analysis = self._analyse(schema, document_string)
+                document_cache.set(key, analysis)
+        return analysis
+
+    def cost(
+        self,
+        schema: GraphQLSchema,
+        document_string: T.Text,
+        operation_name: T.Optional[T.Text] = None,
+    ) -> T.Optional[Cost]:
+        """
+        The cost of the operation ``operation_name`` of a document, going
+        through the cache. ``None`` if the document is invalid or has no
+        such operation. Raises ``GraphQLError`` on syntax errors.
+        """
+        _, _, costs = self._cached(schema, document_string)
+        return select(costs, operation_name)
+
+    def document_from_string(
+        self, schema: GraphQLSchema, document_string: T.Text
+    ) -> GraphQLDocument:
+        document_ast, errors, costs = self._cached(schema, document_string)
+        return GraphQLDocument(
+            schema=schema,
+            document_string=document_string,
+            document_ast=document_ast,
+            execute=partial(_execute, schema, document_ast, errors, costs, self.limits),
+        )
+
+    @staticmethod
+    def _analyse(
+        schema: GraphQLSchema, document_string: T.Text
+    ) -> T.Tuple[Document, T.List[Exception], T.Dict[T.Optional[T.Text], Cost]]:
+        document_ast = parse(document_string)
+        errors = validate(schema, document_ast)
+        # The cost of invalid documents, as of unknown fragments, is moot.
+        costs = {} if errors else measure(document_ast)
+        return document_ast, errors, costs
+
+
+def query_hash(query: T.Text) -> T.Text:
+    """The hex SHA-256 hash of ``query``, identifying a persisted query."""
+    return sha256(query.encode("utf-8")).hexdigest()
+
+
+class PersistedQueries:
+    """
+    The registry of the persisted queries. The queries loaded from file
+    are kept forever, the ones registered by clients are kept in a bounded
+    LRU. Only queries valid against ``schema`` are registered.
+    """
+
+    def __init__(self, schema: GraphQLSchema, size: int = 0) -> None:
+        self.schema = schema
+        self._loaded = {}  # type: T.Dict[T.Text, T.Text]
+        self._registered = LRUCache(size)
+
+    def configure(self, size: int) -> None:
+        """Set how many client registered queries are kept."""
+        self._registered.configure(size)
+
+    def load(self, path: T.Text) -> None:
+        """
+        Load the queries in the JSON file at ``path``: either an object
+        mapping hashes to queries or an array of queries. Raises
+        ``ValueError`` if a hash is wrong or a query is invalid.
+        """
+        with open(path) as f:
+            queries = json.load(f)
+        if isinstance(queries, list):
+            queries = {query_hash(query): query for query in queries}
+        loaded = {}
+        for sha256_hash, query in queries.items():
+            self._check(query, sha256_hash)
+            loaded[sha256_hash] = query
+        self._loaded = loaded
+
+    def register(self, query: T.Text, sha256_hash: T.Text) -> None:
+        """
+        Register ``query`` under ``sha256_hash``. Raises ``ValueError`` if
+        the hash is wrong or the query is invalid.
+        """
+        if self.get(sha256_hash) is None:
+            self._check(query, sha256_hash)
+            self._registered.set(sha256_hash, query)
+
+    def get(self, sha256_hash: T.Text) -> T.Optional[T.Text]:
+        """The query registered under ``sha256_hash``, if any."""
+        query = self._loaded.get(sha256_hash)
+        if query is None:
+            query = self._registered.get(sha256_hash)
+        return query
+
+    def _check(self, query: T.Text, sha256_hash: T.Text) -> None:
+        if not isinstance(query, str) or query_hash(query) != sha256_hash:
+            raise ValueError(f"The hash does not match the query: {sha256_hash}")
+        try:
+            errors = validate(self.schema, parse(query))
+        except GraphQLError as e:
+            errors = [e]
+        if errors:
+            raise ValueError(f"Invalid persisted query {sha256_hash}: {errors[0]}")
+
+    def __len__(self) -> int:
+        return len(self._loaded) + len(self._registered)
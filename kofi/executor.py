@@ -0,0 +1,124 @@
+# -*- encoding: utf-8 -*-
+"""
+The pool the CPU bound computations are handed to.
+
+In ``inline`` mode the computations run on the event loop, as they are
+cheap for single requests. In ``thread`` and ``process`` mode they are
+run in a pool through ``loop.run_in_executor``, so that a large batch
+does not stall the other connections. Process pool workers build their
+own caches and index of the places of birth when they start.
+
+The computations that suspend the caller, in a pool or waiting for their
+turn on the loop, are single-flight: while one is in progress, the callers
+asking for the same one await its future instead of starting another.
+"""
+
+from asyncio import Future, ensure_future, get_event_loop, shield, sleep
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import typing as T
+
+from aiohttp import web
+
+from kofi.cache import setup_cache
+from kofi.places import setup_places
+from kofi.snapshot import load_snapshot, restore_caches
+
+MODES = ("inline", "thread", "process")
+
+
+class SingleFlight:
+    """
+    The computations in progress, by key. ``coalesced`` counts the calls
+    that awaited a computation started by another one.
+    """
+
+    def __init__(self) -> None:
+        self._flights: T.Dict[T.Hashable, "Future"] = {}
+        self.coalesced = 0
+
+    async def do(self, key: T.Any, factory: T.Callable[[], T.Awaitable]) -> T.Any:
+        """
+        Await the computation in progress for ``key`` or start one with
+        ``factory``. Computations with unhashable keys, as batches, are
+        not shared.
+        """
+        try:
+            future = self._flights.get(key)
+        except TypeError:
+            return await factory()
+        if future is None:
+            future = self._flights[key] = ensure_future(factory())
+            future.add_done_callback(lambda _: self._flights.pop(key, None))
+        else:
+            self.coalesced += 1
+        # A caller going away must not cancel the computation of the others.
+        return await shield(future)
+
+
+flights = SingleFlight()
+
+
+def _warm_up(cache_config: T.Dict[T.Text, T.Any]) -> None:
+    """
+    Setup the caches and the place index of a process pool worker, warmed
+    up by the snapshot, if any.
+    """
+    entries = load_snapshot(cache_config)
+    setup_cache(cache_config)
+    setup_places(cache_config)
+    restore_caches(entries)
+
+
+def setup_executor(
+    config: T.Dict[T.Text, T.Any], cache_config: T.Dict[T.Text, T.Any]
+) -> T.Optional[Executor]:
+    """
+    Setup the pool described by the ``executor`` section of the
+    configuration. There is no pool in ``inline`` mode. A ``max_workers``
+    of ``0`` lets the pool pick a size from the number of CPUs.
+    """
+    max_workers = config["max_workers"] or None
+    if config["mode"] == "thread":
+        return ThreadPoolExecutor(max_workers=max_workers)
+    if config["mode"] == "process":
+        return ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_warm_up, initargs=(cache_config,)
+        )
+    return None
+
+
+async def shutdown_executor(app: web.Application) -> None:
+    """Wait for the running computations and stop the pool, if any."""
+    executor = app.get("executor")
+    if executor is not None:
+        executor.shutdown()
+
+
+async def _call(
+    executor: T.Optional[Executor], func: T.Callable, *args: T.Any
+) -> T.Any:
+    if executor is None:
+        await sleep(0)
+        return func(*args)
+    return await get_event_loop().run_in_executor(executor, func, *args)
+
+
+async def call(executor: T.Optional[Executor], func: T.Callable, *args: T.Any) -> T.Any:
+    """
+    Call ``func`` with ``args`` in ``executor`` or, if there is no pool,
+    on the loop once the other ready tasks have run. Concurrent identical
+    calls share the same computation.
+    """
+    return await flights.do((func, args), lambda: _call(executor, func, *args))
+
+
+async def run(req: web.Request, func: T.Callable, *args: T.Any) -> T.Any:
+    """
+    Call ``func`` with ``args`` in the pool of the application, sharing
+    the computation with the concurrent identical calls. Without a pool
+    the call does not suspend, so there is nothing to share.
+    """
+    executor = req.app.get("executor")
+    if executor is None:
+        return func(*args)
+    return await call(executor, func, *args)
@@ -1,13 +1,19 @@
 # -*- encoding: utf-8 -*-
 """This module holds the GraphQL implementation."""
 
+from asyncio import ensure_future
+from json import JSONDecodeError, loads
 import typing as T
 
 from aiohttp import web
 from aiohttp_graphql import GraphQLView
-from codicefiscale import codicefiscale
+from graphql.execution.executors.asyncio import AsyncioExecutor
 from graphql import (
     GraphQLArgument,
+    GraphQLError,
+    GraphQLFloat,
+    GraphQLInt,
+    GraphQLList,
     GraphQLNonNull,
     GraphQLString,
     GraphQLBoolean,
@@ -17,39 +23,73 @@ from graphql import (
     GraphQLObjectType,
     GraphQLEnumType,
 )
+from graphql.backend import set_default_backend
 from graphql.execution.base import ResolveInfo
+from graphql.execution.middleware import MiddlewareManager
+from graphql_server import HttpQueryError, RequestParams, json_encode
 
+from kofi import codes, conditional, places, serializer
+from kofi.cost import check_batch
+from kofi.documents import CachedBackend, PersistedQueries
+from kofi.executor import call
+from kofi.timing import phase
 
-def is_correct(root: T.Any, info: T.Any, **args: T.Dict[T.Text, T.Any]) -> bool:
-    cf = args.get("cf")
-    if cf:
-        try:
-            return codicefiscale.is_valid(cf)
-        except ValueError:
-            return False
-    raise ValueError("Missing argument.")
 
+def _verify(cf: T.Text) -> T.Dict[T.Text, T.Any]:
+    result = codes.analyse(cf)
+    return {
+        "isOmocode": result.is_omocode,
+        "isCorrect": result.is_correct,
+        "canonical": result.canonical,
+        "birthDate": result.birth_date.isoformat() if result.birth_date else None,
+        "gender": result.gender,
+        "birthplaceCode": result.birthplace_code,
+    }
 
-def is_omocode(root: T.Any, info: T.Any, **args: T.Dict[T.Text, T.Any]) -> bool:
+
+async def resolve_verify(
+    root: T.Any, info: T.Any, **args: T.Any
+) -> T.Dict[T.Text, T.Any]:
     cf = args.get("cf")
     if cf:
-        try:
-            return codicefiscale.is_omocode(cf)
-        except ValueError:
-            return False
+        return await _once(info, None, "verify", _verify, cf)
     raise ValueError("Missing argument.")
 
 
-def resolve_verify(root: T.Any, info: T.Any, **args: T.Any) -> T.Dict[T.Text, bool]:
-    return {
-        "isOmocode": is_omocode(root, info, **args),
-        "isCorrect": is_correct(root, info, **args),
-    }
+def _executor(info: ResolveInfo) -> T.Any:
+    """The pool of the application serving the query, if any."""
+    if isinstance(info.context, dict) and "request" in info.context:
+        return info.context["request"].app.get("executor")
+    return None
+
+
+async def _call(name: T.Text, executor: T.Any, func: T.Callable, *args: T.Any) -> T.Any:
+    with phase(name):
+        return await call(executor, func, *args)
 
 
-def resolve_interpolate(
+def _once(
+    info: ResolveInfo, executor: T.Any, name: T.Text, func: T.Callable, *args: T.Any
+) -> T.Awaitable:
+    """
+    Call ``func`` with ``args``, through ``executor``, once per request:
+    the fields asking for the same computation in any operation of the
+    request await the same future. The call is timed as the phase ``name``.
+    """
+    results = None
+    if isinstance(info.context, dict):
+        results = info.context.get("results")
+    if results is None:
+        return _call(name, executor, func, *args)
+    key = (func, args)
+    if key not in results:
+        results[key] = ensure_future(_call(name, executor, func, *args))
+    return results[key]
+
+
+async def resolve_interpolate(
     root: T.Any, info: ResolveInfo, **args: T.Any
-) -> T.Dict[T.Text, T.Text]:
+) -> T.Dict[T.Text, T.Any]:
     name = args.get("name")
     surname = args.get("surname")
     gender = args.get("gender")
@@ -61,14 +101,44 @@ def resolve_interpolate(
             for arg in (name, surname, gender, place_of_birth, date_of_birth)
         ]
     ):
-        return {
-            "codiceFiscale": codicefiscale.encode(
-                surname, name, gender, date_of_birth, place_of_birth
+        executor = _executor(info)
+        match = None
+        if args.get("fuzzy", False):
+            match = await _once(
+                info, executor, "lookup", codes.match_place, place_of_birth
             )
-        }
+            birthplace_code = match.code
+        else:
+            with phase("lookup"):
+                birthplace_code = codes.resolve_place(place_of_birth)
+        cf = await _once(
+            info,
+            executor,
+            "encode",
+            codes.encode,
+            surname,
+            name,
+            gender,
+            date_of_birth,
+            birthplace_code,
+        )
+        return {"codiceFiscale": cf, "placeOfBirth": match}
     raise ValueError("Missing argument.")
 
 
+async def resolve_places(
+    root: T.Any, info: ResolveInfo, **args: T.Any
+) -> T.List[places.Place]:
+    prefix = args.get("prefix")
+    limit = args.get("limit", places.DEFAULT_LIMIT)
+    if not prefix:
+        raise ValueError("Missing argument.")
+    if not 0 < limit <= places.MAX_LIMIT:
+        raise ValueError(f"The limit must be between 1 and {places.MAX_LIMIT}.")
+    with phase("lookup"):
+        return places.birthplaces.search(prefix, limit)
+
+
 codiceFiscaleArg = GraphQLArgument(
     type=GraphQLNonNull(GraphQLString), description="The Codice Fiscale string."
 )
@@ -81,6 +151,19 @@ verifyType = GraphQLObjectType(
             GraphQLBoolean, description="If the CF is omocode, ."
         ),
         "isCorrect": GraphQLField(GraphQLBoolean, description="If the CF is correct."),
+        "canonical": GraphQLField(
+            GraphQLString, description="The non omocode form of a correct CF."
+        ),
+        "birthDate": GraphQLField(
+            GraphQLString, description="The date of birth encoded in a correct CF."
+        ),
+        "gender": GraphQLField(
+            genderType, description="The gender encoded in a correct CF."
+        ),
+        "birthplaceCode": GraphQLField(
+            GraphQLString,
+            description="The code of the place of birth encoded in a correct CF.",
+        ),
     },
 )
 
@@ -119,7 +202,57 @@ interpolateType = GraphQLObjectType(
     fields=lambda: {
         "codiceFiscale": GraphQLField(
             GraphQLString, description="One person's codice fiscale."
-        )
+        ),
+        "placeOfBirth": GraphQLField(
+            placeMatchType,
+            description="The place of birth used, when fuzzy matching is asked.",
+        ),
+    },
+)
+
+fuzzyArg = GraphQLArgument(
+    type=GraphQLBoolean,
+    default_value=False,
+    description="Match a misspelt place of birth with the most similar one",
+)
+
+placeMatchType = GraphQLObjectType(
+    "placeMatchType",
+    description="The place a place of birth has been matched with",
+    fields=lambda: {
+        "name": GraphQLField(GraphQLString, description="The place name."),
+        "code": GraphQLField(
+            GraphQLString, description="The code used in the codice fiscale."
+        ),
+        "score": GraphQLField(
+            GraphQLFloat,
+            description="The similarity with the place of birth, from 0 to 1.",
+        ),
+    },
+)
+
+prefixArg = GraphQLArgument(
+    type=GraphQLNonNull(GraphQLString), description="The beginning of a place name"
+)
+
+limitArg = GraphQLArgument(
+    type=GraphQLInt,
+    default_value=places.DEFAULT_LIMIT,
+    description="The maximum number of places returned",
+)
+
+placeType = GraphQLObjectType(
+    "placeType",
+    description="A municipality or a foreign country",
+    fields=lambda: {
+        "name": GraphQLField(GraphQLString, description="The place name."),
+        "province": GraphQLField(
+            GraphQLString,
+            description="The province of a municipality, EE for countries.",
+        ),
+        "code": GraphQLField(
+            GraphQLString, description="The code used in the codice fiscale."
+        ),
     },
 )
 
@@ -141,15 +274,226 @@ codiceFiscaleQuery = GraphQLObjectType(
                 "gender": genderArg,
                 "dateOfBirth": dateOfBirthArg,
                 "placeOfBirth": placeOfBirthArg,
+                "fuzzy": fuzzyArg,
             },
             resolver=resolve_interpolate,
         ),
+        "places": GraphQLField(
+            GraphQLList(placeType),
+            description="Places of birth whose name starts with a prefix",
+            args={"prefix": prefixArg, "limit": limitArg},
+            resolver=resolve_places,
+        ),
     },
 )
 
-schema = GraphQLSchema(query=codiceFiscaleQuery, types=[verifyType, interpolateType])
+schema = GraphQLSchema(
+    query=codiceFiscaleQuery,
+    types=[verifyType, interpolateType, placeMatchType, placeType],
+)
+
+
+persisted_queries = PersistedQueries(schema)
+
 
+def setup_persisted_queries(config: T.Dict[T.Text, T.Any]) -> PersistedQueries:
+    """Setup the registry of the persisted queries, loading them from file."""
+    persisted_queries.configure(config["size"])
+    if config["file"]:
+        persisted_queries.load(config["file"])
+    return persisted_queries
 
-def get_view(graphiql: bool) -> web.View:
-    """Get the graphql aiohttp view."""
-    return web.view("/graphql", GraphQLView(schema=schema, graphiql=graphiql))
+
+def _encode(data: T.Any, pretty: bool = False) -> T.Text:
+    """Serialise a response, indented for graphiql."""
+    with phase("serialize"):
+        if pretty:
+            return json_encode(data, pretty=True)
+        return serializer.dumps(data).decode()
+
+
+class KofiGraphQLView(GraphQLView):
+    """
+    The GraphQL view, also accepting the hash of a persisted query in the
+    ``persistedQuery`` extension instead of the query text, and arrays of
+    up to ``max_batch_size`` operations. With ``http_cache``, the results
+    of the persisted queries sent with a GET request carry caching headers.
+    The operations of a batch are measured together by ``backend``, that
+    rejects the batches over its limits.
+    """
+
+    def __init__(
+        self,
+        *args: T.Any,
+        register: bool = True,
+        max_batch_size: int = 1,
+        http_cache: T.Optional[T.Dict[T.Text, T.Any]] = None,
+        backend: T.Optional[CachedBackend] = None,
+        **kwargs: T.Any,
+    ) -> None:
+        super().__init__(*args, batch=max_batch_size > 1, **kwargs)
+        self.register = register
+        self.max_batch_size = max_batch_size
+        self.http_cache = http_cache
+        self.backend = backend
+
+    async def __call__(self, request: web.Request) -> web.Response:
+        # With asynchronous execution the missing query is not caught when
+        # rendering graphiql, as it is with the synchronous one.
+        if self.is_graphiql(request) and not (
+            "query" in request.query or "extensions" in request.query
+        ):
+            return await self.render_graphiql(
+                params=RequestParams(None, None, None), result=None
+            )
+        tag = self._etag(request)
+        if tag is None:
+            return await super().__call__(request)
+        headers = conditional.cache_headers(tag, self.http_cache["max_age"])
+        if self.graphiql:
+            # The same URL renders graphiql for browsers.
+            headers["Vary"] = "Accept"
+        if conditional.is_fresh(request, tag):
+            return web.Response(status=304, headers=headers)
+        response = await super().__call__(request)
+        if response.status == 200:
+            response.headers.update(headers)
+        return response
+
+    def _etag(self, request: web.Request) -> T.Optional[T.Text]:
+        """
+        The ETag of a GET request for a persisted query. The requests
+        registering a query, or rendering graphiql, are not cached.
+        """
+        if (
+            not self.http_cache
+            or not self.http_cache["enabled"]
+            or request.method != "GET"
+            or "query" in request.query
+            or self.is_graphiql(request)
+        ):
+            return None
+        try:
+            extensions = loads(request.query.get("extensions", ""))
+            sha256_hash = extensions["persistedQuery"]["sha256Hash"]
+        except (JSONDecodeError, KeyError, TypeError):
+            return None
+        if not isinstance(sha256_hash, str):
+            return None
+        return conditional.etag(
+            request.app["serializer"],
+            "graphql",
+            sha256_hash,
+            request.query.get("variables"),
+            request.query.get("operationName"),
+        )
+
+    def get_context(self, request: web.Request) -> T.Dict[T.Text, T.Any]:
+        """The request context, with the results shared by its resolvers."""
+        context = super().get_context(request)
+        context["results"] = {}
+        return context
+
+    async def parse_body(self, request: web.Request) -> T.Any:
+        with phase("read"):
+            data = await super().parse_body(request)
+        if isinstance(data, dict):
+            return self._resolve_persisted(data, request.query)
+        if isinstance(data, list):
+            if len(data) > self.max_batch_size:
+                raise HttpQueryError(
+                    413, f"At most {self.max_batch_size} operations are allowed"
+                )
+            data = [
+                self._resolve_persisted(entry, {}) if isinstance(entry, dict) else entry
+                for entry in data
+            ]
+            self._check_batch(data)
+        return data
+
+    def _check_batch(self, data: T.List[T.Any]) -> None:
+        """
+        Reject a batch whose operations exceed the limits together. The
+        invalid ones are left to the executor to report.
+        """
+        if self.backend is None or self.backend.limits is None:
+            return
+        costs = []
+        for entry in data:
+            if not isinstance(entry, dict) or not isinstance(entry.get("query"), str):
+                continue
+            try:
+                cost = self.backend.cost(
+                    self.schema, entry["query"], entry.get("operationName")
+                )
+            except GraphQLError:
+                continue
+            if cost is not None:
+                costs.append(cost)
+        reason = check_batch(costs, self.backend.limits)
+        if reason is not None:
+            raise HttpQueryError(400, reason)
+
+    def _resolve_persisted(
+        self, data: T.Dict[T.Text, T.Any], query_data: T.Mapping[T.Text, T.Text]
+    ) -> T.Dict[T.Text, T.Any]:
+        """Put the query persisted under the hash sent by the client in ``data``."""
+        extensions = data.get("extensions") or query_data.get("extensions")
+        if isinstance(extensions, str):
+            try:
+                extensions = loads(extensions)
+            except JSONDecodeError:
+                raise HttpQueryError(400, "Extensions are invalid JSON.")
+        if not isinstance(extensions, dict) or "persistedQuery" not in extensions:
+            return data
+        sha256_hash = (extensions["persistedQuery"] or {}).get("sha256Hash")
+        if not isinstance(sha256_hash, str):
+            raise HttpQueryError(400, "Missing sha256Hash of the persisted query.")
+        query = data.get("query") or query_data.get("query")
+        if query:
+            if not self.register:
+                raise HttpQueryError(400, "PersistedQueryNotSupported")
+            try:
+                persisted_queries.register(query, sha256_hash)
+            except ValueError as e:
+                raise HttpQueryError(400, str(e))
+            return data
+        query = persisted_queries.get(sha256_hash)
+        if query is None:
+            raise HttpQueryError(400, "PersistedQueryNotFound")
+        return {**data, "query": query}
+
+
+def get_view(
+    graphiql: bool,
+    register: bool = True,
+    max_batch_size: int = 1,
+    limits: T.Optional[T.Dict[T.Text, int]] = None,
+    middleware: T.Sequence[T.Any] = (),
+    http_cache: T.Optional[T.Dict[T.Text, T.Any]] = None,
+) -> web.View:
+    """
+    Get the graphql aiohttp view. The resolvers are coroutines, run on
+    the loop by an asyncio executor: they await the computations in the
+    pool of the application, if any, otherwise they let the other tasks
+    run before computing. The parsed and validated documents
+    are cached by the default backend, which rejects the operations over
+    ``limits``. With ``register``, clients can persist new queries.
+    The ``middleware`` wraps the resolvers and must not expect promises.
+    The ``http_cache`` section of the configuration sets the caching of
+    the persisted queries sent with a GET request.
+    """
+    backend = CachedBackend(limits)
+    set_default_backend(backend)
+    kwargs = {
+        "schema": schema,
+        "graphiql": graphiql,
+        "register": register,
+        "max_batch_size": max_batch_size,
+        "http_cache": http_cache,
+        "backend": backend,
+        "executor": AsyncioExecutor(),
+        "middleware": MiddlewareManager(*middleware, wrap_in_promise=False),
+        "encoder": _encode,
+    }
+    return web.view("/graphql", KofiGraphQLView(**kwargs))
@@ -1,14 +1,62 @@
 # -*- encoding: utf-8 -*-
-"""In this module are the tools to configure the logger."""
+"""
+In this module are the tools to configure the logger.
+
+The handlers writing the records to the console, syslog and files do
+blocking I/O, so they are not attached to the logger: the logger puts the
+records in a bounded queue and a ``QueueListener`` thread hands them to
+the handlers. The records are formatted in that thread as well. When the
+queue is full, the records are dropped and counted, rather than stalling
+the event loop.
+"""
 
 import logging
 import logging.handlers
+import queue
 import sys
 import typing as T
 
+from aiohttp import web
+
+QUEUE_SIZE = 10000
+
+_listener = None  # type: T.Optional[logging.handlers.QueueListener]
+_queue_handler = None  # type: T.Optional[BoundedQueueHandler]
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    A handler putting the records in a bounded queue, counting the records
+    dropped when it is full. The records are queued as they are, to be
+    formatted by the handlers of the listener.
+    """
+
+    def __init__(self, size: int) -> None:
+        super().__init__(queue.Queue(size))
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Wait for room in the queue, not to leave the thread running.
+        self.queue.put(self._sentinel)
+
 
 def setup_log(config: T.Dict[T.Text, T.Any]) -> logging.Logger:
-    """Setup the logger."""
+    """
+    Setup the logger, replacing the handlers and the listener thread of a
+    previous setup.
+    """
+    global _listener, _queue_handler
     fmt = setup_formatter()
     level = getattr(logging, config["level"])
     handlers = [setup_console_handler(fmt, level)]
@@ -19,13 +67,41 @@ def setup_log(config: T.Dict[T.Text, T.Any]) -> logging.Logger:
         handlers.append(setup_file_handler(path, fmt, level))
 
     logger = logging.getLogger()
+    stop_log()
+    _queue_handler = BoundedQueueHandler(config.get("queue_size", QUEUE_SIZE))
+    _listener = _Listener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
     logger.setLevel(level=level)
-    for hdlr in handlers:
-        logger.addHandler(hdlr)
+    logger.addHandler(_queue_handler)
 
     return logger
 
 
+def stop_log() -> None:
+    """
+    Write the queued records and stop the listener thread, closing its
+    handlers, if any.
+    """
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = _queue_handler = None
+
+
+async def shutdown_log(app: web.Application) -> None:
+    """Write the queued records before the application exits."""
+    stop_log()
+
+
+def dropped_records() -> int:
+    """How many records have been dropped because the queue was full."""
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
 def setup_formatter() -> logging.Formatter:
     """Setting up a custom formatter."""
     return logging.Formatter(
@@ -0,0 +1,27 @@
+# -*- encoding: utf-8 -*-
+"""The event loop the application runs on."""
+
+import asyncio
+import logging
+import typing as T
+
+try:
+    import uvloop  # type: ignore
+except ImportError:  # pragma: no cover
+    uvloop = None
+
+LOOPS = ("asyncio", "uvloop")
+
+
+def setup_loop(name: T.Text, log: logging.Logger) -> asyncio.AbstractEventLoop:
+    """
+    Install the event loop policy for ``name`` and return the event loop
+    of the current thread. The default asyncio loop is used if uvloop is
+    asked for but it is not installed.
+    """
+    if name == "uvloop":
+        if uvloop is None:
+            log.warning("uvloop is not installed, using the asyncio event loop")
+        else:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return asyncio.get_event_loop()
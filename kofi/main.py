@@ -1,14 +1,28 @@
 # -*- encoding: utf-8 -*-
 """The webserver entrypoint."""
 
-from asyncio import AbstractEventLoop, get_event_loop
+from asyncio import AbstractEventLoop
+import os
+import socket
+import stat
 import typing as T
 
 from aiohttp import web
 
+from kofi.cache import setup_cache, shared_cache
 from kofi.config import read_config
-from kofi.log import setup_log
+from kofi.executor import setup_executor, shutdown_executor
+from kofi.graphql import setup_persisted_queries
+from kofi.log import setup_log, shutdown_log
+from kofi.loop import setup_loop
+from kofi.metrics import metrics_middleware, setup_metrics
+from kofi.places import setup_places
+from kofi.rest import client_max_size
 from kofi.routes import generate_app_routes
+from kofi.serializer import setup_serializer
+from kofi.snapshot import load_snapshot, restore_caches, snapshots
+from kofi.timing import timing_middleware
+from kofi.workers import Supervisor
 
 
 def setup(
@@ -17,30 +31,95 @@ def setup(
     """
     Setup the application.
     """
+    log = setup_log(config["log"])
     if loop is None:
-        loop = get_event_loop()
-    app = web.Application(loop=loop)
+        loop = setup_loop(config["loop"], log)
+    app = web.Application(
+        loop=loop, client_max_size=client_max_size(config["max_batch_size"])
+    )
     app["config"] = config
-    app["log"] = setup_log(config["log"])
+    app["log"] = log
+    app["serializer"] = setup_serializer(config["serializer"], log)
+    # The index in the snapshot spares building it.
+    entries = load_snapshot(config["cache"])
+    app["cache"] = setup_cache(config["cache"])
+    app["places"] = setup_places(config["cache"])
+    restore_caches(entries)
+    app["persisted_queries"] = setup_persisted_queries(config["persisted_queries"])
+    app["executor"] = setup_executor(config["executor"], config["cache"])
+    if config["cache"]["snapshot_path"]:
+        app.cleanup_ctx.append(snapshots)
+    app.on_cleanup.append(shutdown_executor)
+    app.on_cleanup.append(shutdown_log)
+    if config["metrics"]["enabled"]:
+        app["metrics"] = setup_metrics(config["metrics"])
+        app.middlewares.append(metrics_middleware)
+    if config["server_timing"]["enabled"]:
+        sample_percent = config["server_timing"]["sample_percent"]
+        app.middlewares.append(timing_middleware(sample_percent))
     app.add_routes(generate_app_routes(config))
     return app
 
 
-def start(app: web.Application) -> None:
+def start(app: web.Application, sock: T.Optional[socket.socket] = None) -> None:
     """
-    Start the application.
+    Start the application, on ``sock`` if given, otherwise on the unix
+    socket or on the address and port in the configuration.
     """
-    web.run_app(app, host=app["config"]["host"], port=app["config"]["port"])
+    config = app["config"]
+    if sock is not None:
+        web.run_app(app, sock=sock)
+    elif config["unix_socket"]:
+        web.run_app(app, path=config["unix_socket"])
+    else:
+        web.run_app(
+            app,
+            host=config["host"],
+            port=config["port"],
+            reuse_port=config["workers"] > 1,
+        )
+
+
+def bind_unix_socket(path: T.Text) -> socket.socket:
+    """Bind and listen on the unix socket ``path``, replacing a stale one."""
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    sock.listen(socket.SOMAXCONN)
+    return sock
+
+
+def serve(config: T.Dict[T.Text, T.Any]) -> None:
+    """
+    Run the application in this process or, with more than one worker,
+    in as many forked processes sharing the listening port. A unix socket
+    cannot be bound by more than one process, so it is bound before
+    forking and inherited by the workers.
+    """
+    if config["workers"] == 1:
+        start(setup(config))
+        return
+    # Built before forking, the index and the shared cache are shared by
+    # all of the workers.
+    load_snapshot(config["cache"])
+    setup_places(config["cache"])
+    shared_cache.configure(config["cache"]["shared"])
+    sock = None
+    if config["unix_socket"]:
+        sock = bind_unix_socket(config["unix_socket"])
+    Supervisor(config["workers"], lambda: start(setup(config), sock)).run()
 
 
 def run() -> None:
     """KoFi entrypoint."""
     config = read_config()
-    app = setup(config)
-    start(app)
+    serve(config)
 
 
 def run_from_shell(config: T.Dict[T.Text, T.Any]) -> None:
     """KoFi shell entrypoint."""
-    app = setup(config)
-    start(app)
+    serve(config)
@@ -0,0 +1,198 @@
+# -*- encoding: utf-8 -*-
+"""
+The metrics of the application, in the Prometheus text format.
+
+A middleware counts the requests by route, method and status and
+observes their latency in a histogram per route. A GraphQL middleware
+observes the time taken to resolve the root fields of the queries, the
+ones computing a result. Recording a sample is a few dictionary lookups
+and a bisection, so the metrics can be kept on in production.
+
+With more than one worker, each process reports its own metrics.
+"""
+
+from asyncio import iscoroutine
+from bisect import bisect_left
+from collections import defaultdict
+import time
+import typing as T
+
+from aiohttp import web
+from graphql.execution.base import ResolveInfo
+
+
+class Histogram:
+    """
+    The distribution of observed values in cumulative ``buckets``, each
+    counting the values less than or equal to its upper bound.
+    """
+
+    def __init__(self, buckets: T.Sequence[float]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Count ``value`` in the first bucket it fits into."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(
+        self, name: T.Text, labels: T.Text
+    ) -> T.Iterator[T.Tuple[T.Text, T.Text, float]]:
+        """The ``_bucket``, ``_sum`` and ``_count`` samples of the histogram."""
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f"{name}_bucket", f'{labels},le="{bound}"', cumulative
+        yield f"{name}_bucket", f'{labels},le="+Inf"', self.count
+        yield f"{name}_sum", labels, self.sum
+        yield f"{name}_count", labels, self.count
+
+
+class Metrics:
+    """The registry of the request and GraphQL field metrics."""
+
+    def __init__(self, buckets: T.Sequence[float] = ()) -> None:
+        self.configure(buckets)
+
+    def configure(self, buckets: T.Sequence[float]) -> None:
+        """Set the histogram buckets, resetting the metrics."""
+        self.buckets = sorted(buckets)
+        self.requests = defaultdict(int)  # type: T.DefaultDict[T.Tuple, int]
+        self.latency = {}  # type: T.Dict[T.Text, Histogram]
+        self.fields = {}  # type: T.Dict[T.Text, Histogram]
+
+    def observe_request(
+        self, route: T.Text, method: T.Text, status: int, duration: float
+    ) -> None:
+        """Count a request to ``route`` and observe its ``duration``."""
+        self.requests[(route, method, status)] += 1
+        histogram = self.latency.get(route)
+        if histogram is None:
+            histogram = self.latency[route] = Histogram(self.buckets)
+        histogram.observe(duration)
+
+    def observe_field(self, field: T.Text, duration: float) -> None:
+        """Observe the ``duration`` of the resolution of a GraphQL ``field``."""
+        histogram = self.fields.get(field)
+        if histogram is None:
+            histogram = self.fields[field] = Histogram(self.buckets)
+        histogram.observe(duration)
+
+    def render(
+        self,
+        caches: T.Mapping[T.Text, T.Any] = {},
+        counters: T.Mapping[T.Text, T.Tuple[T.Text, int]] = {},
+    ) -> T.Text:
+        """
+        The metrics in the Prometheus text format, with the counters of
+        ``caches`` and the ``counters`` kept elsewhere, mapping their names
+        to their description and value.
+        """
+        lines = [
+            "# HELP kofi_requests_total The HTTP requests served.",
+            "# TYPE kofi_requests_total counter",
+        ]
+        for (route, method, status), count in sorted(self.requests.items()):
+            labels = f'route="{route}",method="{method}",status="{status}"'
+            lines.append(f"kofi_requests_total{{{labels}}} {count}")
+        lines += [
+            "# HELP kofi_request_duration_seconds The latency of the HTTP requests.",
+            "# TYPE kofi_request_duration_seconds histogram",
+        ]
+        for route, histogram in sorted(self.latency.items()):
+            for name, labels, value in histogram.samples(
+                "kofi_request_duration_seconds", f'route="{route}"'
+            ):
+                lines.append(f"{name}{{{labels}}} {value}")
+        lines += [
+            "# HELP kofi_graphql_field_duration_seconds "
+            "The time taken to resolve the GraphQL root fields.",
+            "# TYPE kofi_graphql_field_duration_seconds histogram",
+        ]
+        for field, histogram in sorted(self.fields.items()):
+            for name, labels, value in histogram.samples(
+                "kofi_graphql_field_duration_seconds", f'field="{field}"'
+            ):
+                lines.append(f"{name}{{{labels}}} {value}")
+        for counter in ("hits", "misses", "evictions", "expirations"):
+            lines += [
+                f"# HELP kofi_cache_{counter}_total The {counter} of the caches.",
+                f"# TYPE kofi_cache_{counter}_total counter",
+            ]
+            for name, cache in sorted(caches.items()):
+                value = getattr(cache, counter)
+                lines.append(f'kofi_cache_{counter}_total{{cache="{name}"}} {value}')
+        lines += [
+            "# HELP kofi_cache_entries The entries in the caches.",
+            "# TYPE kofi_cache_entries gauge",
+        ]
+        for name, cache in sorted(caches.items()):
+            lines.append(f'kofi_cache_entries{{cache="{name}"}} {len(cache)}')
+        for name, (description, value) in counters.items():
+            lines += [
+                f"# HELP {name} {description}",
+                f"# TYPE {name} counter",
+                f"{name} {value}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def setup_metrics(config: T.Dict[T.Text, T.Any]) -> Metrics:
+    """Setup the metrics registry with the configured histogram buckets."""
+    metrics.configure(config["buckets"])
+    return metrics
+
+
+@web.middleware
+async def metrics_middleware(request: web.Request, handler: T.Callable) -> T.Any:
+    """Count the requests and observe their latency, by route."""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        resource = request.match_info.route.resource
+        # Unknown paths share a label, not to grow the metrics unbounded.
+        route = resource.canonical if resource is not None else "unmatched"
+        metrics.observe_request(
+            route, request.method, status, time.perf_counter() - start
+        )
+
+
+async def _timed(result: T.Awaitable, field: T.Text, start: float) -> T.Any:
+    try:
+        return await result
+    finally:
+        metrics.observe_field(field, time.perf_counter() - start)
+
+
+class FieldTimer:
+    """
+    A graphql-core middleware observing the time taken to resolve the
+    root fields. It must not be wrapped in promises, as the resolvers are
+    coroutines.
+    """
+
+    def resolve(
+        self, next: T.Callable, root: T.Any, info: ResolveInfo, **args: T.Any
+    ) -> T.Any:
+        if len(info.path) > 1:
+            return next(root, info, **args)
+        start = time.perf_counter()
+        result = next(root, info, **args)
+        if iscoroutine(result):
+            return _timed(result, info.field_name, start)
+        metrics.observe_field(info.field_name, time.perf_counter() - start)
+        return result
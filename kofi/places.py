@@ -0,0 +1,268 @@
+# -*- encoding: utf-8 -*-
+"""
+The index of the places of birth.
+
+``codicefiscale.encode_birthplace`` slugifies the place name and searches
+the library data on every call. The index resolves the usual spellings of
+every municipality and country name with a single dict lookup, computing
+their codes once at startup, and remembers the resolution of any other
+string it is asked for.
+
+The index also keeps the places sorted by their slug, so that the ones
+whose name starts with a given prefix are found with a binary search,
+and an inverted index from the trigrams of every name to the names that
+contain them, so that misspelt places are matched without scanning the
+whole dataset.
+"""
+
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from itertools import chain
+import typing as T
+
+from codicefiscale import codicefiscale, data
+from slugify import slugify
+
+from kofi.cache import LRUCache
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+# The lowest similarity a misspelt place must have to be matched.
+FUZZY_THRESHOLD = 0.3
+
+
+class Place(T.NamedTuple):
+    """A municipality or a country, with its code."""
+
+    name: T.Text
+    province: T.Text
+    code: T.Text
+
+
+class Match(T.NamedTuple):
+    """The place a misspelt place of birth has been matched with."""
+
+    name: T.Text
+    code: T.Text
+    score: float
+
+
+def _trigrams(slug: T.Text) -> T.Set[T.Text]:
+    """The trigrams of every word of ``slug``, padded as ``pg_trgm`` does."""
+    trigrams = set()
+    for word in slug.split("-"):
+        padded = f"  {word} "
+        trigrams.update(padded[idx : idx + 3] for idx in range(len(padded) - 2))
+    return trigrams
+
+
+def _places(indexed: T.Dict[T.Text, T.Any]) -> T.Set[Place]:
+    """All the municipalities, suppressed ones included, and countries."""
+    places = set()
+    for place in list(indexed["municipalities"].values()) + list(
+        indexed["countries"].values()
+    ):
+        for name in place["name"].replace("(soppresso)", "").strip().split("/"):
+            places.add(Place(name.strip(), place["province"], place["code"]))
+    return places
+
+
+class PlaceIndex:
+    """
+    A hashed index from place of birth, as sent by the clients, to its
+    code. Lookups give the same results as ``codicefiscale.encode_birthplace``.
+    """
+
+    def __init__(self, size: int = 0) -> None:
+        self._codes = {}  # type: T.Dict[T.Text, T.Text]
+        self._others = LRUCache(size)
+        self._matches = LRUCache(size)
+        self._slugs = []  # type: T.List[T.Text]
+        self._places = []  # type: T.List[Place]
+        self._names = []  # type: T.List[T.Text]
+        self._name_trigrams = []  # type: T.List[int]
+        self._postings = {}  # type: T.Dict[T.Text, T.List[int]]
+
+    def configure(self, size: int) -> None:
+        """Set how many strings outside of the index are remembered."""
+        self._others.configure(size)
+        self._matches.configure(size)
+
+    def build(self) -> None:
+        """
+        Index the upper, lower and title case spelling of every name, sort
+        the places by slug and index the trigrams of the distinct slugs.
+        """
+        indexed = data.get_indexed_data(str.strip)
+        codes = {}  # type: T.Dict[T.Text, T.Text]
+        for name in set(indexed["municipalities"]) | set(indexed["countries"]):
+            try:
+                code = codicefiscale.encode_birthplace(name)
+            except ValueError:
+                continue
+            # The names are ASCII: the library ignores their case.
+            for spelling in (name.upper(), name.lower(), name.title()):
+                codes[spelling] = code
+        self._codes = codes
+        by_slug = sorted((slugify(place.name), place) for place in _places(indexed))
+        self._slugs = [slug for slug, _ in by_slug]
+        self._places = [place for _, place in by_slug]
+
+        names = []  # type: T.List[T.Text]
+        name_trigrams = []  # type: T.List[int]
+        postings = defaultdict(list)  # type: T.Dict[T.Text, T.List[int]]
+        for slug, place in by_slug:
+            if names and slugify(names[-1]) == slug:
+                continue
+            trigrams = _trigrams(slug)
+            for trigram in trigrams:
+                postings[trigram].append(len(names))
+            names.append(place.name)
+            name_trigrams.append(len(trigrams))
+        self._names = names
+        self._name_trigrams = name_trigrams
+        self._postings = dict(postings)
+
+    def dump(self) -> T.Tuple:
+        """The index, as plain data that ``load`` restores."""
+        return (
+            self._codes,
+            self._slugs,
+            [tuple(place) for place in self._places],
+            self._names,
+            self._name_trigrams,
+            self._postings,
+        )
+
+    def load(self, state: T.Sequence) -> None:
+        """Restore the index from the ``state`` returned by ``dump``."""
+        codes, slugs, places, names, name_trigrams, postings = state
+        self._codes = codes
+        self._slugs = slugs
+        self._places = [Place(*place) for place in places]
+        self._names = names
+        self._name_trigrams = name_trigrams
+        self._postings = postings
+
+    def dump_lookups(self) -> T.Tuple[T.List, T.List]:
+        """
+        The strings outside of the index resolved and matched so far, as
+        plain data that ``load_lookups`` restores. The unknown places are
+        left out, to keep their errors out of the data.
+        """
+        others = [
+            (place, code)
+            for place, code in self._others.items()
+            if isinstance(code, str)
+        ]
+        matches = [
+            (place, tuple(match) if match else False)
+            for place, match in self._matches.items()
+        ]
+        return others, matches
+
+    def load_lookups(self, others: T.Sequence, matches: T.Sequence) -> None:
+        """Remember the lookups returned by ``dump_lookups``."""
+        for place, code in others:
+            self._others.set(place, code)
+        for place, match in matches:
+            self._matches.set(place, Match(*match) if match else False)
+
+    def resolve(self, place_of_birth: T.Text) -> T.Text:
+        """
+        The code of ``place_of_birth``. Raises ``ValueError``, as
+        ``codicefiscale.encode_birthplace`` does, if it is unknown.
+        """
+        code = self._codes.get(place_of_birth)
+        if code is not None:
+            return code
+        code = self._others.get(place_of_birth)
+        if code is None:
+            try:
+                code = codicefiscale.encode_birthplace(place_of_birth)
+            except ValueError as e:
+                code = e
+            self._others.set(place_of_birth, code)
+        if isinstance(code, ValueError):
+            raise ValueError(str(code))
+        return code
+
+    def match(self, place_of_birth: T.Text) -> Match:
+        """
+        The place of birth ``place_of_birth`` stands for. Unknown places
+        are matched with the most similar name, by the share of trigrams
+        they have in common, if it is similar enough. Raises ``ValueError``
+        otherwise.
+        """
+        try:
+            return Match(place_of_birth, self.resolve(place_of_birth), 1.0)
+        except ValueError as e:
+            if not place_of_birth:
+                raise
+            error = e
+        match = self._matches.get(place_of_birth)
+        if match is None:
+            match = self._closest(place_of_birth)
+            self._matches.set(place_of_birth, match)
+        if not match:
+            raise error
+        return match
+
+    def _closest(self, place_of_birth: T.Text) -> T.Union[Match, bool]:
+        """
+        The name with the highest share of trigrams in common with
+        ``place_of_birth``, or ``False`` if none is similar enough.
+        """
+        trigrams = _trigrams(slugify(place_of_birth))
+        shared = Counter(
+            chain.from_iterable(self._postings.get(trigram, ()) for trigram in trigrams)
+        )
+        # No name sharing fewer trigrams can be similar enough.
+        min_shared = FUZZY_THRESHOLD * len(trigrams)
+        sizes = self._name_trigrams
+        best = max(
+            (
+                (count / (len(trigrams) + sizes[idx] - count), -idx)
+                for idx, count in shared.items()
+                if count >= min_shared
+            ),
+            default=None,
+        )
+        if best is None or best[0] < FUZZY_THRESHOLD:
+            return False
+        name = self._names[-best[1]]
+        return Match(name, self.resolve(name), round(best[0], 3))
+
+    def search(self, prefix: T.Text, limit: int) -> T.List[Place]:
+        """
+        At most ``limit`` places whose name starts with ``prefix``, in
+        alphabetical order. Case, accents and punctuation are ignored.
+        """
+        prefix = slugify(prefix)
+        if not prefix:
+            return []
+        start = bisect_left(self._slugs, prefix)
+        end = min(start + limit, len(self._slugs))
+        found = []
+        for idx in range(start, end):
+            if not self._slugs[idx].startswith(prefix):
+                break
+            found.append(self._places[idx])
+        return found
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+
+birthplaces = PlaceIndex()
+
+
+def setup_places(config: T.Dict[T.Text, T.Any]) -> PlaceIndex:
+    """
+    Setup the index of the places of birth used by the interpolate APIs.
+    The dataset is bundled with the library, so it is built only once.
+    """
+    birthplaces.configure(config["size"])
+    if not len(birthplaces):
+        birthplaces.build()
+    return birthplaces
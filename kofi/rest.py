@@ -1,28 +1,268 @@
 # -*- encoding: utf-8 -*-
 """The views that handle the REST API are defined here."""
 
+from json import JSONDecodeError, loads
+import typing as T
+
 from aiohttp import web
 
-from codicefiscale import codicefiscale
+from kofi import codes, conditional, log, serializer
+from kofi.executor import flights, run
+from kofi.places import DEFAULT_LIMIT, MAX_LIMIT
+from kofi.timing import phase
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+INTERPOLATE_FIELDS = ("name", "surname", "gender", "date_of_birth", "place_of_birth")
+TRUE_VALUES = ("1", "true", "yes")
+# The longest line of a streamed request, far longer than any codice fiscale.
+MAX_LINE_SIZE = 2 ** 16
+# The bytes allowed per item of a batch, far more than an interpolate record.
+MAX_ITEM_SIZE = 2 ** 10
+# The aiohttp default for the size of the request bodies.
+MIN_CLIENT_MAX_SIZE = 2 ** 20
+
+
+def client_max_size(max_batch_size: int) -> int:
+    """The largest request body accepted, fitting a full batch."""
+    return max(MIN_CLIENT_MAX_SIZE, max_batch_size * MAX_ITEM_SIZE)
+
+
+def _verify(cf: T.Text) -> T.Dict[T.Text, T.Any]:
+    """Compute the verify response body for a single codice fiscale."""
+    is_correct, is_omocode = codes.verify(cf)
+    return {"isCorrect": is_correct, "isOmocode": is_omocode, "cf": cf}
+
+
+def _interpolate_batch(records: T.List[T.Any]) -> T.List[T.Dict[T.Text, T.Any]]:
+    """Encode every record of a batch, reporting errors item by item."""
+    results = []
+    for record in records:
+        if not isinstance(record, dict):
+            results.append(
+                {"error": "malformed request", "error_msg": "Item is not an object"}
+            )
+            continue
+        missing = [
+            field
+            for field in INTERPOLATE_FIELDS
+            if not isinstance(record.get(field), str)
+        ]
+        if missing:
+            results.append(
+                {
+                    "error": "malformed request",
+                    "error_msg": f"Missing parameter ({'/'.join(missing)}) from item",
+                }
+            )
+            continue
+        try:
+            cf = codes.encode(
+                record["surname"],
+                record["name"],
+                record["gender"],
+                record["date_of_birth"],
+                codes.resolve_place(record["place_of_birth"]),
+            )
+        except ValueError as e:
+            results.append({"error": "malformed request", "error_msg": str(e)})
+            continue
+        results.append({"cf": cf})
+    return results
+
+
+def _respond(
+    data: T.Any,
+    status: int = 200,
+    headers: T.Optional[T.Mapping[T.Text, T.Text]] = None,
+) -> web.Response:
+    """The JSON response with ``data``, timing its serialisation."""
+    with phase("serialize"):
+        return serializer.json_response(data, status, headers)
+
+
+def _etag(req: web.Request, *key: T.Any) -> T.Optional[T.Text]:
+    """The ETag of the response identified by ``key``, if HTTP caching is on."""
+    if not req.app["config"]["http_cache"]["enabled"]:
+        return None
+    return conditional.etag(req.app["serializer"], *key)
+
+
+def _not_modified(
+    req: web.Request, tag: T.Optional[T.Text]
+) -> T.Optional[web.Response]:
+    """The ``304`` response, if the client already has the one tagged ``tag``."""
+    if tag is None or not conditional.is_fresh(req, tag):
+        return None
+    return conditional.not_modified(tag, req.app["config"]["http_cache"]["max_age"])
+
+
+def _cache_headers(
+    req: web.Request, tag: T.Optional[T.Text]
+) -> T.Optional[T.Dict[T.Text, T.Text]]:
+    if tag is None:
+        return None
+    return conditional.cache_headers(tag, req.app["config"]["http_cache"]["max_age"])
+
+
+async def _read_batch(req: web.Request) -> T.List[T.Any]:
+    """
+    Read the items of a batch request, either from a JSON array or,
+    when the content type is ``application/x-ndjson``, from one JSON
+    value per line.
+    """
+    with phase("read"):
+        body = await req.text()
+    try:
+        if req.content_type == NDJSON_CONTENT_TYPE:
+            return [loads(line) for line in body.splitlines() if line.strip()]
+        items = loads(body)
+    except JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON in request body: {e}")
+    if not isinstance(items, list):
+        raise ValueError("The request body must be a JSON array")
+    return items
 
 
 async def verify(req: web.Request) -> web.Response:
     """Validate and handle verify request."""
     cf = req.query.get("cf")
-    req.app["log"].info(f"Received request for {cf}")
+    req.app["log"].info("Received request for %s", cf)
     if not cf:
-        return web.json_response({"error": "malformed request", "cf": cf}, status=400)
+        return _respond({"error": "malformed request", "cf": cf}, status=400)
+    tag = _etag(req, "verify", cf)
+    not_modified = _not_modified(req, tag)
+    if not_modified is not None:
+        return not_modified
+    with phase("verify"):
+        result = _verify(cf)
+    return _respond(result, headers=_cache_headers(req, tag))
+
+
+def _too_large(req: web.Request) -> web.Response:
+    """The error response to a batch over the configured size."""
+    max_batch_size = req.app["config"]["max_batch_size"]
+    return _respond(
+        {
+            "error": "batch too large",
+            "error_msg": f"At most {max_batch_size} items are allowed per batch",
+        },
+        status=413,
+    )
+
+
+def _batch_too_large(
+    req: web.Request, items: T.List[T.Any]
+) -> T.Optional[web.Response]:
+    """Return an error response if the batch exceeds the configured size."""
+    if len(items) > req.app["config"]["max_batch_size"]:
+        return _too_large(req)
+    return None
+
+
+async def verify_batch(req: web.Request) -> web.Response:
+    """Validate and handle batch verify request."""
     try:
-        is_correct = codicefiscale.is_valid(cf)
-        is_omocode = codicefiscale.is_omocode(cf)
-    except ValueError:
-        is_correct = False
-        is_omocode = False
-    return web.json_response(
-        {"isCorrect": is_correct, "isOmocode": is_omocode, "cf": cf}
+        cfs = await _read_batch(req)
+    except web.HTTPRequestEntityTooLarge:
+        return _too_large(req)
+    except ValueError as e:
+        return _respond({"error": "malformed request", "error_msg": str(e)}, status=400)
+    req.app["log"].info("Received batch request for %d codici fiscali", len(cfs))
+    too_large = _batch_too_large(req, cfs)
+    if too_large is not None:
+        return too_large
+    for idx, cf in enumerate(cfs):
+        if not cf or not isinstance(cf, str):
+            return _respond(
+                {
+                    "error": "malformed request",
+                    "error_msg": f"Item {idx} is not a codice fiscale string",
+                },
+                status=400,
+            )
+    with phase("verify"):
+        results = await run(req, codes.verify_many, cfs)
+    return _respond(
+        [
+            {"isCorrect": is_correct, "isOmocode": is_omocode, "cf": cf}
+            for cf, (is_correct, is_omocode) in zip(cfs, results)
+        ]
     )
 
 
+async def _read_lines(content: T.Any) -> T.AsyncIterator[T.Optional[bytes]]:
+    """
+    The lines of a request body as they are received, without the line
+    feed. The lines longer than ``MAX_LINE_SIZE`` are skipped and yielded
+    as ``None``, without keeping them in memory.
+    """
+    pending = bytearray()
+    skipping = False
+    async for chunk in content.iter_any():
+        start = 0
+        end = chunk.find(b"\n")
+        while end >= 0:
+            if skipping or len(pending) + end - start > MAX_LINE_SIZE:
+                yield None
+            else:
+                pending += chunk[start:end]
+                yield bytes(pending)
+            pending.clear()
+            skipping = False
+            start = end + 1
+            end = chunk.find(b"\n", start)
+        if not skipping:
+            pending += chunk[start:]
+            if len(pending) > MAX_LINE_SIZE:
+                pending.clear()
+                skipping = True
+    if skipping:
+        yield None
+    elif pending:
+        yield bytes(pending)
+
+
+async def verify_stream(req: web.Request) -> web.StreamResponse:
+    """
+    Handle a streaming verify request.
+
+    The body is read one NDJSON line at a time and every result is written
+    as soon as it is ready, so memory usage does not depend on the size of
+    the input. Writes wait for the transport to drain, so a slow client
+    throttles the reading of the request body as well. Lines longer than
+    ``MAX_LINE_SIZE`` get an error line.
+    """
+    req.app["log"].info("Received streaming verify request")
+    resp = web.StreamResponse(headers={"Content-Type": NDJSON_CONTENT_TYPE})
+    resp.enable_chunked_encoding()
+    await resp.prepare(req)
+    count = 0
+    async for line in _read_lines(req.content):
+        if line is not None and not line.strip():
+            continue
+        try:
+            cf = loads(line) if line is not None else None
+        except (JSONDecodeError, UnicodeDecodeError):
+            cf = None
+        if line is None:
+            result = {
+                "error": "malformed request",
+                "error_msg": f"Line {count} is longer than {MAX_LINE_SIZE} bytes",
+            }
+        elif cf and isinstance(cf, str):
+            result = _verify(cf)
+        else:
+            result = {
+                "error": "malformed request",
+                "error_msg": f"Line {count} is not a codice fiscale string",
+            }
+        await resp.write(serializer.dumps(result) + b"\n")
+        count += 1
+    await resp.write_eof()
+    req.app["log"].info("Streamed %d verify results", count)
+    return resp
+
+
 async def interpolate(req: web.Request) -> web.Response:
     """Validate and handle interpolate request."""
     name = req.query.get("name")
@@ -30,21 +270,104 @@ async def interpolate(req: web.Request) -> web.Response:
     gender = req.query.get("gender")
     date_of_birth = req.query.get("date_of_birth")
     place_of_birth = req.query.get("place_of_birth")
+    fuzzy = req.query.get("fuzzy", "false").lower() in TRUE_VALUES
     req.app["log"].info(
-        f"Received request for ({name}, {surname}, {gender}, {date_of_birth}, {place_of_birth})"
+        "Received request for (%s, %s, %s, %s, %s)",
+        name,
+        surname,
+        gender,
+        date_of_birth,
+        place_of_birth,
+    )
+    tag = _etag(
+        req, "interpolate", name, surname, gender, date_of_birth, place_of_birth, fuzzy,
     )
+    not_modified = _not_modified(req, tag)
+    if not_modified is not None:
+        return not_modified
     try:
-        cf = codicefiscale.encode(surname, name, gender, date_of_birth, place_of_birth)
+        with phase("lookup"):
+            if fuzzy:
+                match = await run(req, codes.match_place, place_of_birth)
+                birthplace_code = match.code
+            else:
+                birthplace_code = codes.resolve_place(place_of_birth)
+        with phase("encode"):
+            cf = await run(
+                req, codes.encode, surname, name, gender, date_of_birth, birthplace_code
+            )
     except ValueError as e:
-        return web.json_response(
+        return _respond(
             {"error": "malformed request", "error_msg": str(e)}, status=400,
         )
     except TypeError:
-        return web.json_response(
+        return _respond(
             {
                 "error": "malformed request",
                 "error_msg": "Missing parameter (name/surname) from query",
             },
             status=400,
         )
-    return web.json_response({"cf": cf})
+    headers = _cache_headers(req, tag)
+    if fuzzy:
+        return _respond({"cf": cf, "place_of_birth": match._asdict()}, headers=headers)
+    return _respond({"cf": cf}, headers=headers)
+
+
+async def interpolate_batch(req: web.Request) -> web.Response:
+    """Validate and handle batch interpolate request."""
+    try:
+        records = await _read_batch(req)
+    except web.HTTPRequestEntityTooLarge:
+        return _too_large(req)
+    except ValueError as e:
+        return _respond({"error": "malformed request", "error_msg": str(e)}, status=400)
+    req.app["log"].info("Received batch request for %d people", len(records))
+    too_large = _batch_too_large(req, records)
+    if too_large is not None:
+        return too_large
+    with phase("encode"):
+        results = await run(req, _interpolate_batch, records)
+    return _respond(results)
+
+
+async def places(req: web.Request) -> web.Response:
+    """Validate and handle places of birth autocomplete request."""
+    prefix = req.query.get("prefix")
+    req.app["log"].info("Received places request for %s", prefix)
+    try:
+        limit = int(req.query.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        limit = 0
+    if not prefix or not 0 < limit <= MAX_LIMIT:
+        return _respond(
+            {
+                "error": "malformed request",
+                "error_msg": f"A prefix and a limit between 1 and {MAX_LIMIT} are needed",
+            },
+            status=400,
+        )
+    with phase("lookup"):
+        matches = req.app["places"].search(prefix, limit)
+    return _respond([place._asdict() for place in matches])
+
+
+async def cache_stats(req: web.Request) -> web.Response:
+    """Report the usage counters of the result caches."""
+    return _respond({name: cache.stats() for name, cache in req.app["cache"].items()})
+
+
+async def metrics(req: web.Request) -> web.Response:
+    """Report the metrics of the application in the Prometheus text format."""
+    counters = {
+        "kofi_log_dropped_total": (
+            "The log records dropped on a full queue.",
+            log.dropped_records(),
+        ),
+        "kofi_coalesced_total": (
+            "The computations awaited by concurrent identical calls.",
+            flights.coalesced,
+        ),
+    }
+    text = req.app["metrics"].render(req.app["cache"], counters)
+    return web.Response(text=text, content_type="text/plain")
@@ -10,6 +10,19 @@ query parameters:
   - ``cf``: the Codice Fiscale string
 returns:
   - ``{"isCorrect": boolean, "isOmocode": boolean, "cf": str}``
+``/api/verify/batch`` [POST]
+body:
+  - a JSON array of Codice Fiscale strings or, with the
+    ``application/x-ndjson`` content type, one JSON string per line
+returns:
+  - a JSON array with one ``{"isCorrect": boolean, "isOmocode": boolean,
+    "cf": str}`` object per input item, in the same order
+``/api/verify/stream`` [POST]
+body:
+  - one JSON Codice Fiscale string per line (NDJSON), of any length
+returns:
+  - a chunked NDJSON stream with one verify object per input line, written
+    as soon as each line is processed
 ``/api/interpolate`` [GET]
 query parameters:
   - ``name``
@@ -17,8 +30,37 @@ query parameters:
   - ``gender``
   - ``date_of_birth`` in YYYYMMDD format
   - ``place_of_birth``
+  - ``fuzzy`` (optional, ``true`` or ``false``): match a misspelt place of
+    birth with the most similar known one
+returns:
+  - ``{"cf": str}``, with ``"place_of_birth": {"name": str, "code": str,
+    "score": float}`` added in fuzzy mode
+``/api/interpolate/batch`` [POST]
+body:
+  - a JSON array (or NDJSON, as for ``/api/verify/batch``) of
+    ``{"name", "surname", "gender", "date_of_birth", "place_of_birth"}``
+    objects
+returns:
+  - a JSON array with, for each input item and in the same order, either
+    ``{"cf": str}`` or ``{"error": str, "error_msg": str}``
+``/api/places`` [GET]
+query parameters:
+  - ``prefix``: the beginning of a place name
+  - ``limit``: the maximum number of places returned (default 10, at most 100)
+returns:
+  - ``[{"name": str, "province": str, "code": str}]``, the municipalities and
+    countries whose name starts with ``prefix``, in alphabetical order
+``/api/cache/stats`` [GET]
 returns:
-  - ``{"cf": str}``
+  - the usage counters (``size``, ``entries``, ``hits``, ``misses``,
+    ``evictions``, ``expirations``) of the ``verify`` and ``interpolate``
+    result caches and of the ``documents`` cache of parsed GraphQL queries,
+    and of the ``shared`` cache of the workers when enabled
+``/metrics`` [GET]
+returns:
+  - in the Prometheus text format, the count of the requests by route,
+    method and status, the histograms of their latency by route and of
+    the time taken by the GraphQL root fields, and the cache counters
 
 GraphQL:
 
@@ -30,6 +72,10 @@ accepts the following queries
     query verify(cf: String!) {
         isCorrect
         isOmocode
+        canonical
+        birthDate
+        gender
+        birthplaceCode
     }
 
     query interpolate(
@@ -38,12 +84,38 @@ accepts the following queries
         gender: genderType!
         dateOfBirth: String!
         placeOfBirth: String!
+        fuzzy: Boolean = false
     ) {
         codiceFiscale
+        placeOfBirth {
+            name
+            code
+            score
+        }
+    }
+
+    query places(prefix: String!, limit: Int = 10) {
+        name
+        province
+        code
     }
 
 being ``genderType`` an enum comprising ``M`` and ``F`` values
 
+A JSON array of up to ``max_operations`` operations, as set in the
+``query_limits``, can be sent at once.
+Instead of the query, the SHA-256 hash of a persisted query can be sent in
+``{"extensions": {"persistedQuery": {"version": 1, "sha256Hash": str}}}``,
+also as a GET request.
+Operations over the ``query_limits`` of cost, depth or aliases, and
+batches whose operations exceed the cost or aliases together, are
+rejected before they are executed.
+
+The responses of ``/api/verify``, ``/api/interpolate`` and of the persisted
+queries sent with a GET request carry an ``ETag`` and a ``Cache-Control``
+header, as set in the ``http_cache`` section of the configuration: a request
+whose ``If-None-Match`` matches the tag gets a ``304`` response.
+
 """
 
 from aiohttp import web
@@ -51,16 +123,31 @@ import typing as T
 
 from kofi import rest
 from kofi import graphql
+from kofi.metrics import FieldTimer
 
 
 def generate_app_routes(conf: T.Dict[T.Text, T.Any]) -> T.List[web.RouteDef]:
     """Generates the app routes using the configuration parameters."""
     app_routes = [
         web.get("/api/verify", rest.verify),
+        web.post("/api/verify/batch", rest.verify_batch),
+        web.post("/api/verify/stream", rest.verify_stream),
         web.get("/api/interpolate", rest.interpolate),
+        web.post("/api/interpolate/batch", rest.interpolate_batch),
+        web.get("/api/places", rest.places),
+        web.get("/api/cache/stats", rest.cache_stats),
     ]
+    options = {
+        "register": conf["persisted_queries"]["register"],
+        "max_batch_size": conf["query_limits"]["max_operations"],
+        "limits": conf["query_limits"],
+        "http_cache": conf["http_cache"],
+    }
+    if conf["metrics"]["enabled"]:
+        app_routes.append(web.get("/metrics", rest.metrics))
+        options["middleware"] = [FieldTimer()]
     if conf.get("graphiql"):
-        app_routes.append(graphql.get_view(graphiql=True))
+        app_routes.append(graphql.get_view(graphiql=True, **options))
     else:
-        app_routes.append(graphql.get_view(graphiql=False))
+        app_routes.append(graphql.get_view(graphiql=False, **options))
     return app_routes
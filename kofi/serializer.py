@@ -0,0 +1,85 @@
+# -*- encoding: utf-8 -*-
+"""
+The JSON serializer of the REST and GraphQL responses.
+
+orjson and ujson serialise the large batch responses several times faster
+than the standard library. They are installed with the ``orjson`` and
+``ujson`` extras: with ``auto``, the fastest one installed is used, and
+the standard library ``json`` module otherwise.
+"""
+
+import json
+import logging
+import typing as T
+
+from aiohttp import web
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import ujson  # type: ignore
+except ImportError:  # pragma: no cover
+    ujson = None
+
+SERIALIZERS = ("auto", "orjson", "ujson", "json")
+
+
+def _orjson_dumps(obj: T.Any) -> bytes:
+    return orjson.dumps(obj)
+
+
+def _ujson_dumps(obj: T.Any) -> bytes:
+    return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode()
+
+
+def _json_dumps(obj: T.Any) -> bytes:
+    return json.dumps(obj).encode()
+
+
+_DUMPS = {"orjson": _orjson_dumps, "ujson": _ujson_dumps, "json": _json_dumps}
+
+_dumps = _json_dumps
+
+
+def _installed() -> T.List[T.Text]:
+    """The serializers installed, fastest first."""
+    modules = (("orjson", orjson), ("ujson", ujson), ("json", json))
+    return [name for name, module in modules if module is not None]
+
+
+def setup_serializer(name: T.Text, log: logging.Logger) -> T.Text:
+    """
+    Use the serializer ``name``, falling back to the standard library if
+    it is not installed. Returns the name of the serializer in use.
+    """
+    global _dumps
+    installed = _installed()
+    if name == "auto":
+        name = installed[0]
+    elif name not in installed:
+        log.warning("%s is not installed, using the json module", name)
+        name = "json"
+    _dumps = _DUMPS[name]
+    return name
+
+
+def dumps(obj: T.Any) -> bytes:
+    """Serialise ``obj`` to UTF-8 encoded JSON."""
+    return _dumps(obj)
+
+
+def json_response(
+    data: T.Any,
+    status: int = 200,
+    headers: T.Optional[T.Mapping[T.Text, T.Text]] = None,
+) -> web.Response:
+    """A JSON response with ``data``, as ``aiohttp.web.json_response``."""
+    return web.Response(
+        body=dumps(data),
+        status=status,
+        headers=headers,
+        content_type="application/json",
+    )
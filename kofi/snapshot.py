@@ -0,0 +1,187 @@
+# -*- encoding: utf-8 -*-
+"""
+Snapshots of the index of the places of birth and of the hot cache
+entries, to restart warm.
+
+Building the index takes about a second, and a restarted process answers
+from empty caches. With ``snapshot_path`` set in the ``cache`` section of
+the configuration, the index and the entries of the ``verify`` and
+``interpolate`` caches, and of the places resolved outside of the index,
+are written to that file every ``snapshot_interval`` seconds and on
+shutdown, and loaded back at startup.
+
+The file starts with a header holding a format version and a fingerprint
+of the versions of kofi, python-codicefiscale and Python, followed by the
+index and the cache entries, serialised with ``marshal``. A snapshot
+whose header does not match, written by another version, is ignored. The
+file is memory-mapped, and the index is read only when it has not been
+built yet: the workers forked with an index only read the cache entries.
+The entries expire ``ttl`` seconds after being restored.
+"""
+
+import asyncio
+from contextlib import suppress
+from datetime import date
+from hashlib import sha256
+import logging
+import marshal
+import mmap
+import os
+import struct
+import sys
+import typing as T
+
+from aiohttp import web
+from codicefiscale.version import __version__ as codicefiscale_version
+
+from kofi import __version__
+from kofi import places
+from kofi.analysis import Analysis
+from kofi.cache import interpolate_cache, verify_cache
+
+MAGIC = b"KOFI"
+# Bumped whenever the layout of the snapshots changes.
+FORMAT = 1
+# The magic, format, fingerprint and length of the index.
+HEADER = struct.Struct("<4sH32sQ")
+
+log = logging.getLogger(__name__)
+
+
+def _fingerprint() -> bytes:
+    """What the content of a snapshot depends on, besides its format."""
+    versions = (
+        __version__,
+        codicefiscale_version,
+        sys.version_info[:2],
+        marshal.version,
+    )
+    return sha256(repr(versions).encode()).digest()
+
+
+def _dump_analysis(result: Analysis) -> T.Tuple:
+    birth_date = result.birth_date.toordinal() if result.birth_date else None
+    return result[:4] + (birth_date,) + result[5:]
+
+
+def _load_analysis(entry: T.Sequence) -> Analysis:
+    birth_date = date.fromordinal(entry[4]) if entry[4] else None
+    return Analysis(*entry[:4], birth_date, *entry[5:])  # type: ignore
+
+
+def _entries() -> T.Dict[T.Text, T.Any]:
+    """The entries of the caches, as plain data."""
+    others, matches = places.birthplaces.dump_lookups()
+    return {
+        "verify": [(cf, _dump_analysis(result)) for cf, result in verify_cache.items()],
+        "interpolate": interpolate_cache.items(),
+        "places": others,
+        "matches": matches,
+    }
+
+
+def _write(path: T.Text, index: T.Tuple, entries: T.Dict[T.Text, T.Any]) -> None:
+    """Write the snapshot to a temporary file, then move it to ``path``."""
+    index_data = marshal.dumps(index)
+    entries_data = marshal.dumps(entries)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT, _fingerprint(), len(index_data)))
+        f.write(index_data)
+        f.write(entries_data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+async def write_snapshot(path: T.Text) -> None:
+    """
+    Write a snapshot to ``path``. The entries are collected on the event
+    loop and written by a thread; the index is never changed once built.
+    """
+    index = places.birthplaces.dump()
+    entries = _entries()
+    loop = asyncio.get_event_loop()
+    try:
+        await loop.run_in_executor(None, _write, path, index, entries)
+    except OSError as e:
+        log.warning("Could not write the snapshot %s: %s", path, e)
+
+
+def _read(path: T.Text, with_index: bool) -> T.Optional[T.Tuple[T.Any, T.Any]]:
+    """The index, if ``with_index``, and the entries of the snapshot."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        if len(m) < HEADER.size:
+            raise ValueError("truncated header")
+        magic, version, fingerprint, index_size = HEADER.unpack_from(m, 0)
+        if (magic, version, fingerprint) != (MAGIC, FORMAT, _fingerprint()):
+            return None
+        start = HEADER.size
+        with memoryview(m) as view:
+            index = None
+            if with_index:
+                with view[start : start + index_size] as index_data:
+                    index = marshal.loads(index_data)
+            with view[start + index_size :] as entries_data:
+                entries = marshal.loads(entries_data)
+    return index, entries
+
+
+def load_snapshot(config: T.Dict[T.Text, T.Any]) -> T.Optional[T.Dict[T.Text, T.Any]]:
+    """
+    Read the snapshot in the cache ``config``, restoring the index of the
+    places if it has not been built yet. Returns the cache entries, to be
+    restored by ``restore_caches`` once the caches are set up, or ``None``
+    when there is no valid snapshot.
+    """
+    path = config["snapshot_path"]
+    if not path:
+        return None
+    try:
+        snapshot = _read(path, not len(places.birthplaces))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, EOFError, TypeError) as e:
+        log.warning("Ignoring the unreadable snapshot %s: %s", path, e)
+        return None
+    if snapshot is None:
+        log.info("Ignoring the snapshot %s, written by another version", path)
+        return None
+    index, entries = snapshot
+    if index is not None:
+        places.birthplaces.load(index)
+    return entries
+
+
+def restore_caches(entries: T.Optional[T.Dict[T.Text, T.Any]]) -> None:
+    """Restore the cache ``entries`` returned by ``load_snapshot``."""
+    if entries is None:
+        return
+    for cf, result in entries["verify"]:
+        verify_cache.set(cf, _load_analysis(result))
+    for key, cf in entries["interpolate"]:
+        interpolate_cache.set(key, cf)
+    places.birthplaces.load_lookups(entries["places"], entries["matches"])
+
+
+async def _write_periodically(path: T.Text, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        await write_snapshot(path)
+
+
+async def snapshots(app: web.Application) -> T.AsyncIterator[None]:
+    """
+    The cleanup context writing the snapshots every ``snapshot_interval``
+    seconds, and a last one on shutdown. With several workers, each one
+    writes its own entries in turn.
+    """
+    config = app["config"]["cache"]
+    task = asyncio.ensure_future(
+        _write_periodically(config["snapshot_path"], config["snapshot_interval"])
+    )
+    yield
+    task.cancel()
+    with suppress(asyncio.CancelledError):
+        await task
+    await write_snapshot(config["snapshot_path"])
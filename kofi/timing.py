@@ -0,0 +1,94 @@
+# -*- encoding: utf-8 -*-
+"""
+The breakdown of the time spent serving a request, by phase.
+
+For a sample of the requests a middleware puts a ``Timing`` in the
+context of the task serving it, and the REST and GraphQL views time their
+phases with ``phase``: reading the request, parsing the query, looking
+up the place of birth, computing the result and serialising it. The
+phases are returned in the ``Server-Timing`` response header, along with
+the ``total`` time. Outside of the sampled requests ``phase`` does
+nothing.
+
+A phase run more than once in a request, as the computations of the
+fields of a GraphQL query, is reported with its total duration. As those
+computations may run concurrently, the phases can add up to more than
+the ``total``.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+import random
+import time
+import typing as T
+
+from aiohttp import web
+
+
+class Timing:
+    """The durations of the phases of a request, in seconds."""
+
+    def __init__(self) -> None:
+        self.phases = {}  # type: T.Dict[T.Text, float]
+
+    def add(self, name: T.Text, duration: float) -> None:
+        """Add ``duration`` to the phase ``name``."""
+        self.phases[name] = self.phases.get(name, 0.0) + duration
+
+    @contextmanager
+    def phase(self, name: T.Text) -> T.Iterator[None]:
+        """Time the phase ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def header(self) -> T.Text:
+        """The ``Server-Timing`` header value, in milliseconds."""
+        return ", ".join(
+            f"{name};dur={duration * 1000:.3f}"
+            for name, duration in self.phases.items()
+        )
+
+
+_current = ContextVar("timing", default=None)  # type: ContextVar[T.Optional[Timing]]
+
+
+@contextmanager
+def _untimed() -> T.Iterator[None]:
+    yield
+
+
+def phase(name: T.Text) -> T.ContextManager[None]:
+    """Time the phase ``name`` of the current request, if it is sampled."""
+    timing = _current.get()
+    if timing is None:
+        return _untimed()
+    return timing.phase(name)
+
+
+def timing_middleware(sample_percent: float) -> T.Callable:
+    """
+    The middleware timing ``sample_percent`` percent of the requests.
+    Streamed responses are sent before their phases are known, so they
+    carry no header.
+    """
+
+    @web.middleware
+    async def middleware(request: web.Request, handler: T.Callable) -> T.Any:
+        if random.random() * 100 >= sample_percent:
+            return await handler(request)
+        timing = Timing()
+        token = _current.set(timing)
+        start = time.perf_counter()
+        try:
+            response = await handler(request)
+        finally:
+            _current.reset(token)
+        timing.add("total", time.perf_counter() - start)
+        if not response.prepared:
+            response.headers["Server-Timing"] = timing.header()
+        return response
+
+    return middleware
@@ -0,0 +1,89 @@
+# -*- encoding: utf-8 -*-
+"""
+Pre-fork multi-worker server.
+
+The master process forks ``workers`` processes that each run the whole
+application, binding the same address with ``SO_REUSEPORT`` so that the
+kernel balances the connections among them. The master restarts the
+workers that die and, on ``SIGINT`` or ``SIGTERM``, forwards the signal to
+them and waits for them to shut down gracefully.
+"""
+
+import logging
+import os
+import signal
+import time
+import traceback
+import typing as T
+
+# Workers dying sooner than this after being started are restarted only
+# after this delay, so that a broken configuration does not fork bomb.
+RESTART_DELAY = 1.0
+
+log = logging.getLogger(__name__)
+
+
+class Supervisor:
+    """Fork ``workers`` processes running ``target`` and keep them alive."""
+
+    def __init__(
+        self,
+        workers: int,
+        target: T.Callable[[], None],
+        restart_delay: float = RESTART_DELAY,
+    ) -> None:
+        self.workers = workers
+        self.target = target
+        self.restart_delay = restart_delay
+        self.stopping = False
+        self._children = {}  # type: T.Dict[int, float]
+
+    def run(self) -> None:
+        """Start the workers and supervise them until they are stopped."""
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGTERM, self._stop)
+        for _ in range(self.workers):
+            self._spawn()
+        while self._children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:  # pragma: no cover
+                break
+            started = self._children.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            log.error("Worker %d died with status %d, restarting it", pid, status)
+            if time.monotonic() - started < self.restart_delay:
+                time.sleep(self.restart_delay)
+            if not self.stopping:
+                self._spawn()
+
+    def _spawn(self) -> None:
+        pid = os.fork()
+        if pid:
+            self._children[pid] = time.monotonic()
+            return
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 0
+        try:
+            self.target()
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _stop(self, signum: int, frame: T.Any) -> None:
+        """
+        Forward the signal to the workers. A second signal kills the
+        workers that are still shutting down.
+        """
+        if self.stopping:
+            signum = signal.SIGKILL
+        self.stopping = True
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:  # pragma: no cover
+                pass
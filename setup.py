@@ -11,10 +11,18 @@ requirements = [
     "aiohttp==3.6.2",
     "aiohttp-graphql==1.0.0",
     "python-codicefiscale==0.3.7",
+    "python-slugify",
     "pyyaml",
     "Click>=7.0,<8",
 ]
 
+extras_requirements = {
+    "numpy": ["numpy"],
+    "orjson": ["orjson"],
+    "ujson": ["ujson"],
+    "uvloop": ["uvloop"],
+}
+
 setup_requirements = []
 
 test_requirements = []
@@ -36,6 +44,7 @@ setup(
     ],
     description="Microservice to check or create a Codice Fiscale",
     entry_points={"console_scripts": ["kofi=kofi.cli:main",],},
+    extras_require=extras_requirements,
     install_requires=requirements,
     license="MIT license",
     long_description=readme,
@@ -0,0 +1,108 @@
+# -*- encoding: utf-8 -*-
+"""Test the single pass analysis against python-codicefiscale."""
+
+from random import Random
+import string
+import typing as T
+
+from codicefiscale import codicefiscale
+import pytest
+
+from kofi.analysis import analyse
+
+CORPUS_SIZE = 20000
+OMOCODIA = dict(zip("0123456789", "LMNPQRSTUV"))
+SUBS_INDEXES = [6, 7, 9, 10, 12, 13, 14]
+ALNUM = string.ascii_uppercase + string.digits
+
+
+def random_code(rnd: Random) -> T.Text:
+    """A syntactically plausible codice fiscale, often a valid one."""
+    letters = "".join(rnd.choice(string.ascii_uppercase) for _ in range(6))
+    year = f"{rnd.randrange(100):02d}"
+    month = rnd.choice("ABCDEHLMPRST")
+    day = f"{rnd.choice([0, 40]) + rnd.randrange(0, 33):02d}"
+    place = rnd.choice(string.ascii_uppercase) + f"{rnd.randrange(1000):03d}"
+    body = list(letters + year + month + day + place)
+    for idx in SUBS_INDEXES:
+        if rnd.random() < 0.2:
+            body[idx] = OMOCODIA[body[idx]]
+    if rnd.random() < 0.1:
+        body[rnd.choice([12, 13, 14])] = rnd.choice(string.ascii_uppercase)
+    code = "".join(body)
+    return code + codicefiscale.encode_cin(code)
+
+
+def mangle(code: T.Text, rnd: Random) -> T.Text:
+    """Apply one of the ways real inputs differ from a clean code."""
+    choice = rnd.randrange(8)
+    if choice == 0:
+        return code.lower()
+    if choice == 1:
+        return f" {code[:6]} {code[6:11]}-{code[11:]} "
+    if choice == 2:
+        idx = rnd.randrange(16)
+        return code[:idx] + rnd.choice(ALNUM) + code[idx + 1 :]
+    if choice == 3:
+        return code[:15]
+    if choice == 4:
+        return "".join(rnd.choice(ALNUM) for _ in range(16))
+    if choice == 5:
+        return code[:15] + rnd.choice(string.ascii_uppercase)
+    return code
+
+
+def corpus() -> T.List[T.Text]:
+    rnd = Random(1312)
+    return [mangle(random_code(rnd), rnd) for _ in range(CORPUS_SIZE)]
+
+
+def library_verify(cf: T.Text) -> T.Tuple[bool, bool]:
+    try:
+        return codicefiscale.is_valid(cf), codicefiscale.is_omocode(cf)
+    except ValueError:
+        return False, False
+
+
+def test_corpus_against_library() -> None:
+    """Every facet agrees with the library on a large corpus."""
+    correct = omocode = 0
+    for cf in corpus():
+        result = analyse(cf)
+        assert (result.is_correct, result.is_omocode) == library_verify(cf), cf
+        if not result.is_correct:
+            assert result.canonical is None
+            continue
+        correct += 1
+        omocode += result.is_omocode
+        decoded = codicefiscale.decode(cf)
+        assert result.canonical == decoded["omocodes"][0]
+        assert result.birth_date == decoded["birthdate"].date()
+        assert result.gender == decoded["sex"]
+        assert result.birthplace_code == result.canonical[11:15]
+    # Make sure the corpus exercises both outcomes of every check.
+    assert 0 < omocode < correct < CORPUS_SIZE
+
+
+@pytest.mark.parametrize(
+    "cf, facets",
+    [
+        ["RSSMRA99E05H501A", (True, False, "RSSMRA99E05H501A", "M", "H501")],
+        ["RSSMRA99E05H50GP", (True, True, "RSSMRA99E05H50GP", "M", "H50G")],
+        ["BNCMRA70T67F205L", (True, False, "BNCMRA70T67F205L", "F", "F205")],
+        ["bncmra70t67f205l", (True, False, "BNCMRA70T67F205L", "F", "F205")],
+        ["BCDFGH12A55Z123F", (False, False, None, None, None)],
+        ["", (False, False, None, None, None)],
+    ],
+)
+def test_analyse(cf: T.Text, facets: T.Tuple[T.Any, ...]) -> None:
+    """Test some known codes."""
+    result = analyse(cf)
+    assert result.cf == cf
+    assert (
+        result.is_correct,
+        result.is_omocode,
+        result.canonical,
+        result.gender,
+        result.birthplace_code,
+    ) == facets
@@ -0,0 +1,168 @@
+# -*- encoding: utf-8 -*-
+"""Test the result caches."""
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sys
+from unittest import mock
+
+import pytest
+
+from kofi import codes
+from kofi.cache import LRUCache, SharedCache, interpolate_cache, verify_cache
+
+
+def test_lru_eviction() -> None:
+    """The least recently used entry is evicted first."""
+    cache = LRUCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats() == {
+        "size": 2,
+        "entries": 2,
+        "hits": 3,
+        "misses": 1,
+        "evictions": 1,
+        "expirations": 0,
+    }
+
+
+def test_ttl_expiration() -> None:
+    """Entries older than the ttl are dropped."""
+    cache = LRUCache(2, ttl=10)
+    with mock.patch("kofi.cache.time.monotonic", return_value=100):
+        cache.set("a", 1)
+    with mock.patch("kofi.cache.time.monotonic", return_value=105):
+        assert cache.get("a") == 1
+    with mock.patch("kofi.cache.time.monotonic", return_value=111):
+        assert cache.get("a") is None
+    assert len(cache) == 0
+    assert cache.expirations == 1
+
+
+def test_disabled() -> None:
+    """A zero sized cache stores nothing."""
+    cache = LRUCache(0)
+    cache.set("a", 1)
+    assert cache.get("a", "default") == "default"
+    assert len(cache) == 0
+
+
+def test_lru_threads() -> None:
+    """Concurrent accesses from threads are consistent."""
+    cache = LRUCache(4)
+
+    def churn(offset: int) -> None:
+        for idx in range(20000):
+            cache.set(offset + idx % 8, idx)
+            cache.get(offset + (idx + 3) % 8)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(8) as pool:
+            for future in [pool.submit(churn, offset % 3) for offset in range(8)]:
+                future.result()
+    finally:
+        sys.setswitchinterval(interval)
+    assert len(cache) == 4
+    assert cache.hits + cache.misses == 8 * 20000
+
+
+@pytest.fixture
+def shared() -> SharedCache:
+    cache = SharedCache()
+    cache.configure(8)
+    yield cache
+    cache.close()
+
+
+def test_shared_cache(shared: SharedCache) -> None:
+    """Values are found by kind and key."""
+    shared.set(b"verify", ("RSSMRA99E05H501A",), b"\x01\x00")
+    shared.set(b"interpolate", ("Rossi", "Mario"), b"RSSMRA99E05H501A")
+    assert shared.get(b"verify", ("RSSMRA99E05H501A",)) == b"\x01\x00".ljust(16, b"\0")
+    assert shared.get(b"interpolate", ("Rossi", "Mario")) == b"RSSMRA99E05H501A"
+    assert shared.get(b"verify", ("Rossi", "Mario")) is None
+    assert shared.get(b"interpolate", ("RossiMario",)) is None
+    shared.configure(8)
+    assert shared.get(b"interpolate", ("Rossi", "Mario")) == b"RSSMRA99E05H501A"
+    assert shared.stats() == {
+        "size": 8,
+        "entries": 2,
+        "hits": 1,
+        "misses": 0,
+        "evictions": 0,
+        "expirations": 0,
+    }
+    with pytest.raises(TypeError):
+        shared.get(b"interpolate", ("Rossi", None))
+
+
+def test_shared_cache_eviction(shared: SharedCache) -> None:
+    """Once the probed slots are taken, the first one is overwritten."""
+    # Digests all starting with the same 8 bytes share the same slots.
+    with mock.patch.object(SharedCache, "_digest", lambda self, kind, key: key[0]):
+        for key in (b"a", b"b", b"c", b"d", b"e"):
+            shared.set(b"k", (bytes(15) + key,), key)
+        assert shared.evictions == 1
+        assert shared.get(b"k", (bytes(15) + b"a",)) is None
+        assert shared.get(b"k", (bytes(15) + b"e",)) == b"e".ljust(16, b"\0")
+        assert len(shared) == 4
+
+
+def test_shared_cache_torn(shared: SharedCache) -> None:
+    """A slot whose checksum does not match is a miss."""
+    shared.set(b"verify", ("RSSMRA99E05H501A",), b"\x01\x00")
+    for offset in range(shared.HEADER.size, len(shared._shm.buf), shared.SLOT.size):
+        shared._shm.buf[offset + shared.SLOT.size - 1] ^= 0xFF
+    assert shared.get(b"verify", ("RSSMRA99E05H501A",)) is None
+
+
+def test_shared_cache_fork(shared: SharedCache) -> None:
+    """The values stored by a forked process are seen by the others."""
+    pid = os.fork()
+    if pid == 0:
+        shared.set(b"verify", ("RSSMRA99E05H501A",), b"\x01\x00")
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert shared.get(b"verify", ("RSSMRA99E05H501A",)) is not None
+
+
+def test_verify_shared(shared: SharedCache) -> None:
+    """Verify results come from the shared cache when known to it."""
+    with mock.patch("kofi.codes.shared_cache", shared):
+        assert codes.verify("RSSMRA99E05H50GP") == (True, True)
+        with mock.patch("kofi.codes._analyse") as analyse:
+            assert codes.verify("RSSMRA99E05H50GP") == (True, True)
+        analyse.assert_not_called()
+        codes.analyse("RSSMRA99E05H501A")
+        with mock.patch("kofi.codes._analyse") as analyse:
+            assert codes.verify("RSSMRA99E05H501A") == (True, False)
+        analyse.assert_not_called()
+        assert codes.encode("Rossi", "Mario", "M", "1999-05-05", "H501") == (
+            "RSSMRA99E05H501A"
+        )
+        interpolate_cache.clear()
+        with mock.patch("kofi.codes.codicefiscale") as library:
+            cf = codes.encode("Rossi", "Mario", "M", "1999-05-05", "H501")
+        assert cf == "RSSMRA99E05H501A"
+        library.encode_surname.assert_not_called()
+
+
+def test_verify_local_first(shared: SharedCache) -> None:
+    """The verify cache of the process is checked before the shared cache."""
+    verify_cache.configure(10)
+    try:
+        with mock.patch("kofi.codes.shared_cache", shared):
+            codes.verify("RSSMRA99E05H50GP")
+            with mock.patch.object(shared, "get") as get:
+                assert codes.verify("RSSMRA99E05H50GP") == (True, True)
+            get.assert_not_called()
+    finally:
+        verify_cache.configure(0)
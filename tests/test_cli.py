@@ -1,6 +1,8 @@
 # -*- encoding: utf-8 -*-
 """Test the cli."""
 
+import json
+
 from click.testing import CliRunner
 import pytest
 
@@ -14,11 +16,17 @@ Options:
   -c, --config TEXT               The path to the config file.
   -b, --bind-address TEXT         The address to bind kofi to.
   -p, --port INTEGER              The port to bind kofi to.
+  -u, --unix-socket TEXT          The unix socket to bind kofi to, instead of
+                                  address and port.
+  --loop [asyncio|uvloop]         The event loop implementation.
+  -w, --workers INTEGER           The number of worker processes.
   -l, --log-level [DEBUG|INFO|WARNING|ERROR]
                                   The log level
   --syslog                        Send the log also to the syslog
   --log-file PATH                 Send the log also to file
   --graphiql                      Enable the graphiql facility
+  --verify FILENAME               Verify the codici fiscali in the file (one per
+                                  line, - for stdin) and exit.
   --help                          Show this message and exit.
 """
 
@@ -49,3 +57,34 @@ def test_port_validation(runner: CliRunner) -> None:
     assert invalid_res.exit_code == 2
     assert 'Invalid value for "-p" / "--port"' in invalid_res.output
     assert "'port' is invalid in configuration" in invalid_res.output
+
+
+def test_unix_socket_validation(runner: CliRunner) -> None:
+    """Test the validation for -u parameter."""
+    invalid_res = runner.invoke(cli.main, ["-u", "/nonexistent/kofi.sock"])
+    assert invalid_res.exit_code == 2
+    assert 'Invalid value for "-u" / "--unix-socket"' in invalid_res.output
+    assert "'unix_socket' is invalid in configuration" in invalid_res.output
+
+
+def test_workers_validation(runner: CliRunner) -> None:
+    """Test the validation for -w parameter."""
+    invalid_res = runner.invoke(cli.main, ["-w", "0"])
+    assert invalid_res.exit_code == 2
+    assert 'Invalid value for "-w" / "--workers"' in invalid_res.output
+    assert "'workers' is invalid in configuration" in invalid_res.output
+
+
+def test_verify_file(runner: CliRunner) -> None:
+    """Test the --verify parameter."""
+    result = runner.invoke(
+        cli.main,
+        ["--verify", "-"],
+        input="RSSMRA99E05H501A\n\nRSSMRA99E05H50GP\nBCDFGH12A55Z123F\n",
+    )
+    assert result.exit_code == 0
+    assert [json.loads(line) for line in result.output.splitlines()] == [
+        {"isCorrect": True, "isOmocode": False, "cf": "RSSMRA99E05H501A"},
+        {"isCorrect": True, "isOmocode": True, "cf": "RSSMRA99E05H50GP"},
+        {"isCorrect": False, "isOmocode": False, "cf": "BCDFGH12A55Z123F"},
+    ]
@@ -9,7 +9,18 @@ from unittest import mock
 import yaml
 import pytest
 
-from kofi.config import read_config, merge_configs, DEFAULT_LOG_CONF
+from kofi.config import (
+    read_config,
+    merge_configs,
+    DEFAULT_CACHE_CONF,
+    DEFAULT_HTTP_CACHE_CONF,
+    DEFAULT_EXECUTOR_CONF,
+    DEFAULT_LOG_CONF,
+    DEFAULT_METRICS_CONF,
+    DEFAULT_PERSISTED_QUERIES_CONF,
+    DEFAULT_QUERY_LIMITS_CONF,
+    DEFAULT_SERVER_TIMING_CONF,
+)
 
 
 def fill_mock_conf(conf: T.Dict[T.Text, T.Any], tmpdir: py.path.local) -> T.Text:
@@ -70,6 +81,18 @@ def test_merge_conf(
                 "port": 13121,
                 "log": {"level": "DEBUG", "syslog": True, "log_file": "/tmp/logfile",},
                 "graphiql": True,
+                "max_batch_size": 10000,
+                "workers": 1,
+                "serializer": "auto",
+                "unix_socket": None,
+                "loop": "asyncio",
+                "cache": DEFAULT_CACHE_CONF,
+                "executor": DEFAULT_EXECUTOR_CONF,
+                "persisted_queries": DEFAULT_PERSISTED_QUERIES_CONF,
+                "query_limits": DEFAULT_QUERY_LIMITS_CONF,
+                "metrics": DEFAULT_METRICS_CONF,
+                "server_timing": DEFAULT_SERVER_TIMING_CONF,
+                "http_cache": DEFAULT_HTTP_CACHE_CONF,
             },
         ],
         [
@@ -79,6 +102,18 @@ def test_merge_conf(
                 "port": 1312,
                 "log": {"level": "ERROR", "syslog": True},
                 "graphiql": False,
+                "max_batch_size": 10000,
+                "workers": 1,
+                "serializer": "auto",
+                "unix_socket": None,
+                "loop": "asyncio",
+                "cache": DEFAULT_CACHE_CONF,
+                "executor": DEFAULT_EXECUTOR_CONF,
+                "persisted_queries": DEFAULT_PERSISTED_QUERIES_CONF,
+                "query_limits": DEFAULT_QUERY_LIMITS_CONF,
+                "metrics": DEFAULT_METRICS_CONF,
+                "server_timing": DEFAULT_SERVER_TIMING_CONF,
+                "http_cache": DEFAULT_HTTP_CACHE_CONF,
             },
         ],
         [
@@ -88,6 +123,18 @@ def test_merge_conf(
                 "port": 1312,
                 "log": DEFAULT_LOG_CONF,
                 "graphiql": False,
+                "max_batch_size": 10000,
+                "workers": 1,
+                "serializer": "auto",
+                "unix_socket": None,
+                "loop": "asyncio",
+                "cache": DEFAULT_CACHE_CONF,
+                "executor": DEFAULT_EXECUTOR_CONF,
+                "persisted_queries": DEFAULT_PERSISTED_QUERIES_CONF,
+                "query_limits": DEFAULT_QUERY_LIMITS_CONF,
+                "metrics": DEFAULT_METRICS_CONF,
+                "server_timing": DEFAULT_SERVER_TIMING_CONF,
+                "http_cache": DEFAULT_HTTP_CACHE_CONF,
             },
         ],
         [
@@ -97,6 +144,18 @@ def test_merge_conf(
                 "port": 13121,
                 "log": DEFAULT_LOG_CONF,
                 "graphiql": False,
+                "max_batch_size": 10000,
+                "workers": 1,
+                "serializer": "auto",
+                "unix_socket": None,
+                "loop": "asyncio",
+                "cache": DEFAULT_CACHE_CONF,
+                "executor": DEFAULT_EXECUTOR_CONF,
+                "persisted_queries": DEFAULT_PERSISTED_QUERIES_CONF,
+                "query_limits": DEFAULT_QUERY_LIMITS_CONF,
+                "metrics": DEFAULT_METRICS_CONF,
+                "server_timing": DEFAULT_SERVER_TIMING_CONF,
+                "http_cache": DEFAULT_HTTP_CACHE_CONF,
             },
         ],
         [
@@ -106,6 +165,18 @@ def test_merge_conf(
                 "port": 1312,
                 "log": DEFAULT_LOG_CONF,
                 "graphiql": False,
+                "max_batch_size": 10000,
+                "workers": 1,
+                "serializer": "auto",
+                "unix_socket": None,
+                "loop": "asyncio",
+                "cache": DEFAULT_CACHE_CONF,
+                "executor": DEFAULT_EXECUTOR_CONF,
+                "persisted_queries": DEFAULT_PERSISTED_QUERIES_CONF,
+                "query_limits": DEFAULT_QUERY_LIMITS_CONF,
+                "metrics": DEFAULT_METRICS_CONF,
+                "server_timing": DEFAULT_SERVER_TIMING_CONF,
+                "http_cache": DEFAULT_HTTP_CACHE_CONF,
             },
         ],
     ],
@@ -158,6 +229,7 @@ def test_port_validation(port: int, tmpdir: py.path.local) -> None:
             {"log_file": "/not/existing/path/to/logfile"},
             "Base directory does not exist",
         ],
+        [{"queue_size": 0}, "It must be a positive integer"],
     ],
 )
 def test_log_validation(
@@ -171,3 +243,284 @@ def test_log_validation(
 
     assert "is invalid in configuration" in str(e.value)
     assert msg in str(e.value)
+
+
+@pytest.mark.parametrize("max_batch_size", [0, -1, "many", True])
+def test_max_batch_size_validation(
+    max_batch_size: T.Any, tmpdir: py.path.local
+) -> None:
+    """Test the conf validation"""
+    conf_path = fill_mock_conf({"max_batch_size": max_batch_size}, tmpdir)
+    with pytest.raises(ValueError) as e:
+        with mock.patch("kofi.config._find_conf", return_value=str(conf_path)):
+            conf = read_config()
+
+    assert "'max_batch_size' is invalid in configuration" in str(e.value)
+
+
+@pytest.mark.parametrize(
+    "conf_data, msg",
+    [
+        [{"loop": "trio"}, "'loop' is invalid in configuration"],
+        [{"unix_socket": "/nonexistent/kofi.sock"}, "'unix_socket' is invalid"],
+    ],
+)
+def test_loop_and_unix_socket_validation(
+    conf_data: T.Dict[T.Text, T.Any], msg: T.Text, tmpdir: py.path.local
+) -> None:
+    """Test the conf validation"""
+    conf_path = fill_mock_conf(conf_data, tmpdir)
+    with pytest.raises(ValueError) as e:
+        with mock.patch("kofi.config._find_conf", return_value=str(conf_path)):
+            conf = read_config()
+
+    assert msg in str(e.value)
+
+
+@pytest.mark.parametrize("workers", [0, -2, "all", False])
+def test_workers_validation(workers: T.Any, tmpdir: py.path.local) -> None:
+    """Test the conf validation"""
+    conf_path = fill_mock_conf({"workers": workers}, tmpdir)
+    with pytest.raises(ValueError) as e:
+        with mock.patch("kofi.config._find_conf", return_value=str(conf_path)):
+            conf = read_config()
+
+    assert "'workers' is invalid in configuration" in str(e.value)
+
+
+@pytest.mark.parametrize("serializer", ["simplejson", 1])
+def test_serializer_validation(serializer: T.Any, tmpdir: py.path.local) -> None:
+    """Test the conf validation"""
+    conf_path = fill_mock_conf({"serializer": serializer}, tmpdir)
+    with pytest.raises(ValueError) as e:
+        with mock.patch("kofi.config._find_conf", return_value=str(conf_path)):
+            conf = read_config()
+
+    assert "'serializer' is invalid in configuration" in str(e.value)
+
+
+@pytest.mark.parametrize(
+    "cache_conf, result",
+    [
+        [{}, DEFAULT_CACHE_CONF],
+        [{"size": 0}, {**DEFAULT_CACHE_CONF, "size": 0}],
+        [
+            {"size": 12, "ttl": 0.5, "documents": 0, "shared": 100},
+            {
+                **DEFAULT_CACHE_CONF,
+                "size": 12,
+                "ttl": 0.5,
+                "documents": 0,
+                "shared": 100,
+            },
+        ],
+        [
+            {"snapshot_path": "/tmp/kofi.snapshot", "snapshot_interval": 60},
+            {
+                **DEFAULT_CACHE_CONF,
+                "snapshot_path": "/tmp/kofi.snapshot",
+                "snapshot_interval": 60,
+            },
+        ],
+    ],
+)
+def test_cache_conf(
+    cache_conf: T.Dict[T.Text, T.Any],
+    result: T.Dict[T.Text, T.Any],
+    tmpdir: py.path.local,
+) -> None:
+    """Test the cache section of the conf."""
+    conf_path = fill_mock_conf({"cache": cache_conf}, tmpdir)
+    with mock.patch("kofi.config._find_conf", return_value=str(conf_path)):
+        conf = read_config()
+
+    assert conf["cache"] == result
+
+
+@pytest.mark.parametrize(
+    "cache_conf, msg",
+    [
+        [{"size": -1}, "'size' is invalid in configuration"],
+        [{"size": "big"}, "'size' is invalid in configuration"],
+        [{"ttl": -3}, "'ttl' is invalid in configuration"],
+        [{"documents": -1}, "'documents' is invalid in configuration"],
+        [{"shared": -1}, "'shared' is invalid in configuration"],
+        [
+            {"snapshot_path": "/nonexistent/kofi.snapshot"},
+            "'snapshot_path' is invalid in configuration",
+        ],
+        [{"snapshot_interval": 0}, "'snapshot_interval' is invalid in configuration"],
+    ],
+)
+def test_cache_validation(
+    cache_conf: T.Dict[T.Text, T.Any], msg: T.Text, tmpdir: py.path.local
+) -> None:
+    """Test the conf validation"""
+    conf_path = fill_mock_conf({"cache": cache_conf}, tmpdir)
+    with pytest.raises(ValueError) as e:
+        with mock.patch("kofi.config._find_conf", return_value=str(conf_path)):
+            conf = read_config()
+
+    assert msg in str(e.value)
+
+
+@pytest.mark.parametrize(
+    "executor_conf, result",
+    [
+        [{}, {"mode": "inline", "max_workers": 0}],
+        [{"mode": "process"}, {"mode": "process", "max_workers": 0}],
+        [{"mode": "thread", "max_workers": 4}, {"mode": "thread", "max_workers": 4}],
+    ],
+)
+def test_executor_conf(
+    executor_conf: T.Dict[T.Text, T.Any],
+    result: T.Dict[T.Text, T.Any],
+    tmpdir: py.path.local,
+) -> None:
+    """Test the executor section of the conf."""
+    conf_path = fill_mock_conf({"executor": executor_conf}, tmpdir)
+    with mock.patch("kofi.config._find_conf", return_value=str(conf_path)):
+        conf = read_config()
+
+    assert conf["executor"] == result
+
+
+@pytest.mark.parametrize(
+    "executor_conf, msg",
+    [
+        [{"mode": "fork"}, "'mode' is invalid in configuration"],
+        [{"max_workers": -1}, "'max_workers' is invalid in configuration"],
+        [{"max_workers": True}, "'max_workers' is invalid in configuration"],
+    ],
+)
+def test_executor_validation(
+    executor_conf: T.Dict[T.Text, T.Any], msg: T.Text, tmpdir: py.path.local
+) -> None:
+    """Test the conf validation"""
+    conf_path = fill_mock_conf({"executor": executor_conf}, tmpdir)
+    with pytest.raises(ValueError) as e:
+        with mock.patch("kofi.config._find_conf", return_value=str(conf_path)):
+            conf = read_config()
+
+    assert msg in str(e.value)
+
+
+@pytest.mark.parametrize(
+    "persisted_conf, msg",
+    [
+        [{"file": "/nonexistent/queries.json"}, "'file' is invalid in configuration"],
+        [{"register": "yes"}, "'register' is invalid in configuration"],
+        [{"size": -1}, "'size' is invalid in configuration"],
+    ],
+)
+def test_persisted_queries_validation(
+    persisted_conf: T.Dict[T.Text, T.Any], msg: T.Text, tmpdir: py.path.local
+) -> None:
+    """Test the conf validation"""
+    conf_path = fill_mock_conf({"persisted_queries": persisted_conf}, tmpdir)
+    with pytest.raises(ValueError) as e:
+        with mock.patch("kofi.config._find_conf", return_value=str(conf_path)):
+            conf = read_config()
+
+    assert msg in str(e.value)
+
+
+@pytest.mark.parametrize(
+    "limits_conf, msg",
+    [
+        [{"max_cost": 0}, "'max_cost' is invalid in configuration"],
+        [{"max_depth": "deep"}, "'max_depth' is invalid in configuration"],
+        [{"max_aliases": True}, "'max_aliases' is invalid in configuration"],
+    ],
+)
+def test_query_limits_validation(
+    limits_conf: T.Dict[T.Text, T.Any], msg: T.Text, tmpdir: py.path.local
+) -> None:
+    """Test the conf validation"""
+    conf_path = fill_mock_conf({"query_limits": limits_conf}, tmpdir)
+    with pytest.raises(ValueError) as e:
+        with mock.patch("kofi.config._find_conf", return_value=str(conf_path)):
+            conf = read_config()
+
+    assert msg in str(e.value)
+
+
+@pytest.mark.parametrize(
+    "metrics_conf, msg",
+    [
+        [{"enabled": "yes"}, "'enabled' is invalid in configuration"],
+        [{"buckets": []}, "'buckets' is invalid in configuration"],
+        [{"buckets": [0.1, -1]}, "'buckets' is invalid in configuration"],
+        [{"buckets": "fast"}, "'buckets' is invalid in configuration"],
+    ],
+)
+def test_metrics_validation(
+    metrics_conf: T.Dict[T.Text, T.Any], msg: T.Text, tmpdir: py.path.local
+) -> None:
+    """Test the conf validation"""
+    conf_path = fill_mock_conf({"metrics": metrics_conf}, tmpdir)
+    with pytest.raises(ValueError) as e:
+        with mock.patch("kofi.config._find_conf", return_value=str(conf_path)):
+            conf = read_config()
+
+    assert msg in str(e.value)
+
+
+@pytest.mark.parametrize(
+    "timing_conf, msg",
+    [
+        [{"enabled": 1}, "'enabled' is invalid in configuration"],
+        [{"sample_percent": 101}, "'sample_percent' is invalid in configuration"],
+        [{"sample_percent": "all"}, "'sample_percent' is invalid in configuration"],
+    ],
+)
+def test_server_timing_validation(
+    timing_conf: T.Dict[T.Text, T.Any], msg: T.Text, tmpdir: py.path.local
+) -> None:
+    """Test the conf validation"""
+    conf_path = fill_mock_conf({"server_timing": timing_conf}, tmpdir)
+    with pytest.raises(ValueError) as e:
+        with mock.patch("kofi.config._find_conf", return_value=str(conf_path)):
+            conf = read_config()
+
+    assert msg in str(e.value)
+
+
+@pytest.mark.parametrize(
+    "http_cache_conf, result",
+    [
+        [{}, {"enabled": True, "max_age": 3600}],
+        [{"enabled": False, "max_age": 0}, {"enabled": False, "max_age": 0}],
+    ],
+)
+def test_http_cache_conf(
+    http_cache_conf: T.Dict[T.Text, T.Any],
+    result: T.Dict[T.Text, T.Any],
+    tmpdir: py.path.local,
+) -> None:
+    """Test the http_cache section of the conf."""
+    conf_path = fill_mock_conf({"http_cache": http_cache_conf}, tmpdir)
+    with mock.patch("kofi.config._find_conf", return_value=str(conf_path)):
+        conf = read_config()
+
+    assert conf["http_cache"] == result
+
+
+@pytest.mark.parametrize(
+    "http_cache_conf, msg",
+    [
+        [{"enabled": "no"}, "'enabled' is invalid in configuration"],
+        [{"max_age": -1}, "'max_age' is invalid in configuration"],
+        [{"max_age": "1h"}, "'max_age' is invalid in configuration"],
+    ],
+)
+def test_http_cache_validation(
+    http_cache_conf: T.Dict[T.Text, T.Any], msg: T.Text, tmpdir: py.path.local
+) -> None:
+    """Test the conf validation"""
+    conf_path = fill_mock_conf({"http_cache": http_cache_conf}, tmpdir)
+    with pytest.raises(ValueError) as e:
+        with mock.patch("kofi.config._find_conf", return_value=str(conf_path)):
+            conf = read_config()
+
+    assert msg in str(e.value)
@@ -0,0 +1,102 @@
+# -*- encoding: utf-8 -*-
+"""Test the cost analysis of the GraphQL documents."""
+
+import typing as T
+
+import pytest
+from graphql import parse
+from graphql.utils.introspection_query import introspection_query
+
+from kofi.cost import INTROSPECTION_MAX_DEPTH, Cost, check, check_batch, measure
+
+LIMITS = {"max_cost": 100, "max_depth": 3, "max_aliases": 2}
+
+
+@pytest.mark.parametrize(
+    "query, cost",
+    [
+        ['{ verify(cf: "RSSMRA99E05H501A") { isCorrect } }', Cost(2, 2, 0)],
+        [
+            '{ a: interpolate(name: "Mario", surname: "Rossi", gender: M,'
+            ' birthDate: "1999-05-05", placeOfBirth: "Roma") { codiceFiscale } }',
+            Cost(11, 2, 1),
+        ],
+        ['{ places(prefix: "rom", limit: 5) { name code } }', Cost(12, 2, 0)],
+        ['{ places(prefix: "rom") { name } }', Cost(12, 2, 0)],
+        [
+            'query ($n: Int) { places(prefix: "rom", limit: $n) { name } }',
+            Cost(102, 2, 0),
+        ],
+        ["{ __schema { types { name fields { name } } } }", Cost(5, 0, 0, 4)],
+        ["{ __typename a: __typename }", Cost(2, 1, 1)],
+        [
+            """
+            { verify(cf: "RSSMRA99E05H501A") { ...fields } }
+            fragment fields on verifyType {
+                isCorrect
+                ... on verifyType { c: canonical }
+            }
+            """,
+            Cost(3, 2, 1),
+        ],
+    ],
+)
+def test_measure(query: T.Text, cost: Cost) -> None:
+    """Fields are counted once per item, through fragments and introspection."""
+    assert measure(parse(query)) == {None: cost}
+
+
+def test_measure_operations() -> None:
+    """Every operation of a document is measured on its own."""
+    costs = measure(parse('query a { places(prefix: "r") { name } } query b { x }'))
+    assert costs == {"a": Cost(12, 2, 0), "b": Cost(1, 1, 0)}
+
+
+@pytest.mark.parametrize(
+    "cost, reason",
+    [
+        [Cost(100, 3, 2), None],
+        [Cost(101, 1, 0), "Query cost 101 exceeds the maximum of 100"],
+        [Cost(1, 4, 0), "Query depth 4 exceeds the maximum of 3"],
+        [Cost(1, 1, 3), "Query aliases 3 exceed the maximum of 2"],
+        [Cost(1, 0, 0, INTROSPECTION_MAX_DEPTH), None],
+        [Cost(1, 0, 0, 14), "Introspection depth 14 exceeds the maximum of 13"],
+    ],
+)
+def test_check(cost: Cost, reason: T.Optional[T.Text]) -> None:
+    """The operations over any of the limits are reported."""
+    assert check({None: cost}, None, LIMITS) == reason
+    assert check({"op": cost, "other": Cost(0, 0, 0)}, "op", LIMITS) == reason
+    assert check({"op": cost}, "unknown", LIMITS) is None
+
+
+def test_check_introspection() -> None:
+    """The introspection of graphiql is allowed, deeper or wider ones are not."""
+    limits = {"max_cost": 1000, "max_depth": 10, "max_aliases": 100}
+    assert check(measure(parse(introspection_query)), None, limits) is None
+    deep = "{ __schema { types { %s name %s } } }" % (
+        "fields { type { " * 30,
+        "} } " * 30,
+    )
+    assert check(measure(parse(deep)), None, limits) == (
+        "Introspection depth 63 exceeds the maximum of 13"
+    )
+    types = "__schema { types { fields { args { type { ofType { name } } } } } }"
+    wide = "{ %s }" % " ".join(f"a{i}: {types}" for i in range(2000))
+    assert check(measure(parse(wide)), None, limits) == (
+        "Query aliases 2000 exceed the maximum of 100"
+    )
+
+
+@pytest.mark.parametrize(
+    "costs, reason",
+    [
+        [[], None],
+        [[Cost(50, 3, 1), Cost(50, 3, 1)], None],
+        [[Cost(60, 1, 0), Cost(41, 1, 0)], "Batch cost 101 exceeds the maximum of 100"],
+        [[Cost(1, 1, 2), Cost(1, 1, 1)], "Batch aliases 3 exceed the maximum of 2"],
+    ],
+)
+def test_check_batch(costs: T.List[Cost], reason: T.Optional[T.Text]) -> None:
+    """The operations of a batch add up against the limits."""
+    assert check_batch(costs, LIMITS) == reason
@@ -0,0 +1,102 @@
+# -*- encoding: utf-8 -*-
+"""Test the cache of the parsed GraphQL documents."""
+
+import json
+import py  # type: ignore
+import typing as T
+from unittest import mock
+
+import pytest
+
+from kofi import codes
+from kofi.cache import document_cache
+from kofi.documents import CachedBackend, PersistedQueries, query_hash
+from kofi.graphql import schema
+from tests.test_graphql import graphql
+
+QUERY = """
+query correct { verify(cf: "RSSMRA99E05H501A") { isCorrect } }
+query omocode { verify(cf: "RSSMRA99E05H50GP") { isOmocode } }
+"""
+
+
+@pytest.fixture
+def backend() -> CachedBackend:
+    document_cache.configure(10)
+    yield CachedBackend()
+    document_cache.configure(0)
+
+
+def test_document_cache(backend: CachedBackend) -> None:
+    """Every operation of a document runs from the same cache entry."""
+    correct = graphql(schema, QUERY, operation_name="correct", backend=backend)
+    omocode = graphql(schema, QUERY, operation_name="omocode", backend=backend)
+    assert correct.data == {"verify": {"isCorrect": True}}
+    assert omocode.data == {"verify": {"isOmocode": True}}
+    assert document_cache.stats()["entries"] == 1
+    assert document_cache.stats()["hits"] == 1
+
+
+def test_invalid_document(backend: CachedBackend) -> None:
+    """The validation errors are cached with the document."""
+    for _ in range(2):
+        result = graphql(schema, "{ verify { isCorrect } }", backend=backend)
+        assert result.invalid
+        assert 'argument "cf"' in str(result.errors[0])
+    assert document_cache.stats()["hits"] == 1
+
+
+def test_syntax_error(backend: CachedBackend) -> None:
+    """Syntax errors are not cached."""
+    result = graphql(schema, "{ verify(", backend=backend)
+    assert result.invalid
+    assert len(document_cache) == 0
+
+
+def test_persisted_queries_load(tmpdir: py.path.local) -> None:
+    """Queries are loaded from an array or from a map of hashes."""
+    queries = PersistedQueries(schema)
+    path = tmpdir.join("queries.json")
+    path.write(json.dumps([QUERY]))
+    queries.load(str(path))
+    assert queries.get(query_hash(QUERY)) == QUERY
+    path.write(json.dumps({query_hash(QUERY): QUERY}))
+    queries.load(str(path))
+    assert queries.get(query_hash(QUERY)) == QUERY
+    assert len(queries) == 1
+
+
+@pytest.mark.parametrize(
+    "content", [{"0" * 64: QUERY}, ["{ verify { isCorrect } }"], ["{ verify("],],
+)
+def test_persisted_queries_load_invalid(content: T.Any, tmpdir: py.path.local) -> None:
+    """Wrong hashes and invalid queries are not loaded."""
+    path = tmpdir.join("queries.json")
+    path.write(json.dumps(content))
+    with pytest.raises(ValueError):
+        PersistedQueries(schema).load(str(path))
+
+
+def test_persisted_queries_register() -> None:
+    """Registered queries are kept in a bounded LRU."""
+    queries = PersistedQueries(schema, 1)
+    other = '{ places(prefix: "Rom") { name } }'
+    queries.register(QUERY, query_hash(QUERY))
+    assert queries.get(query_hash(QUERY)) == QUERY
+    queries.register(other, query_hash(other))
+    assert queries.get(query_hash(QUERY)) is None
+    with pytest.raises(ValueError):
+        queries.register(QUERY, query_hash(other) + "0")
+
+
+def test_query_limits(backend: CachedBackend) -> None:
+    """Operations over the limits are not executed."""
+    backend.limits = {"max_cost": 2, "max_depth": 10, "max_aliases": 10}
+    with mock.patch("kofi.codes.analyse", wraps=codes.analyse) as analyse:
+        result = graphql(schema, QUERY, operation_name="correct", backend=backend)
+        assert result.data == {"verify": {"isCorrect": True}}
+        query = '{ a: verify(cf: "RSSMRA99E05H501A") { isCorrect isOmocode } }'
+        result = graphql(schema, query, backend=backend)
+        assert result.invalid
+        assert "Query cost 3 exceeds the maximum of 2" in str(result.errors[0])
+        assert analyse.call_count == 1
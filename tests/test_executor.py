@@ -0,0 +1,67 @@
+# -*- encoding: utf-8 -*-
+"""Test the single-flight computations."""
+
+import asyncio
+from unittest import mock
+
+import pytest
+
+from kofi.executor import SingleFlight, call
+
+
+async def test_single_flight() -> None:
+    """Concurrent calls with the same key share one computation."""
+    flights = SingleFlight()
+    started = []
+
+    async def compute(value: int) -> int:
+        started.append(value)
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    results = await asyncio.gather(
+        flights.do("a", lambda: compute(1)),
+        flights.do("a", lambda: compute(1)),
+        flights.do("b", lambda: compute(2)),
+    )
+    assert results == [2, 2, 4]
+    assert started == [1, 2]
+    assert flights.coalesced == 1
+    # Finished computations are not kept.
+    assert await flights.do("a", lambda: compute(3)) == 6
+
+
+async def test_single_flight_unhashable() -> None:
+    """Computations with unhashable keys are not shared."""
+    flights = SingleFlight()
+    results = await asyncio.gather(
+        flights.do(["a"], lambda: asyncio.sleep(0, "x")),
+        flights.do(["a"], lambda: asyncio.sleep(0, "y")),
+    )
+    assert results == ["x", "y"]
+    assert flights.coalesced == 0
+
+
+async def test_single_flight_errors() -> None:
+    """Errors reach every caller, and a cancelled one does not stop the others."""
+    flights = SingleFlight()
+
+    async def fail() -> None:
+        await asyncio.sleep(0.01)
+        raise ValueError("Invalid")
+
+    first = asyncio.ensure_future(flights.do("a", fail))
+    second = asyncio.ensure_future(flights.do("a", fail))
+    await asyncio.sleep(0)
+    first.cancel()
+    with pytest.raises(ValueError):
+        await second
+    assert first.cancelled()
+
+
+async def test_call_coalesced() -> None:
+    """Identical calls on the loop compute once."""
+    func = mock.Mock(return_value=1)
+    results = await asyncio.gather(call(None, func, "x"), call(None, func, "x"))
+    assert results == [1, 1]
+    assert func.call_count == 1
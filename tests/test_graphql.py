@@ -1,13 +1,16 @@
 # -*- encoding: utf-8 -*-
 """Test the graphql module."""
 
+import asyncio
 from collections import OrderedDict, namedtuple
 import typing as T
 
-from graphql import graphql
+from graphql import graphql as run_graphql
+from graphql.execution.executors.asyncio import AsyncioExecutor
 import pytest
 
 from kofi.graphql import schema
+from kofi.places import setup_places
 
 VERIFY_QUERY = """
 query {{
@@ -32,6 +35,16 @@ query {{
 }}
 """
 
+
+def graphql(schema: T.Any, query: T.Text, **kwargs: T.Any) -> T.Any:
+    """Run the asynchronous resolvers of ``query`` on a new loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        return run_graphql(schema, query, executor=AsyncioExecutor(loop=loop), **kwargs)
+    finally:
+        loop.close()
+
+
 PersonalData = namedtuple(
     "PersonalData", ["name", "surname", "gender", "place", "date"]
 )
@@ -92,3 +105,50 @@ def test_interpolate(personal_data: namedtuple, expected: T.Text) -> None:
         ),
     )
     assert result.data == expected
+
+
+def test_places() -> None:
+    """Test the places query."""
+    setup_places({"size": 10})
+    result = graphql(
+        schema, '{ places(prefix: "Milan", limit: 1){ name, province, code } }'
+    )
+    assert result.data == OrderedDict(
+        [
+            (
+                "places",
+                [
+                    OrderedDict(
+                        [("name", "MILANO"), ("province", "MI"), ("code", "F205")]
+                    )
+                ],
+            )
+        ]
+    )
+
+
+def test_interpolate_fuzzy() -> None:
+    """Test the interpolate query with a misspelt place of birth."""
+    setup_places({"size": 10})
+    result = graphql(
+        schema,
+        """{ interpolate(name: "Maria", surname: "Bianchi", gender: F,
+        dateOfBirth: "1970-12-27", placeOfBirth: "Milno", fuzzy: true) {
+            codiceFiscale, placeOfBirth { name, code } } }""",
+    )
+    assert result.data == OrderedDict(
+        [
+            (
+                "interpolate",
+                OrderedDict(
+                    [
+                        ("codiceFiscale", "BNCMRA70T67F205L"),
+                        (
+                            "placeOfBirth",
+                            OrderedDict([("name", "MILANO"), ("code", "F205")]),
+                        ),
+                    ]
+                ),
+            )
+        ]
+    )
@@ -0,0 +1,30 @@
+# -*- encoding: utf-8 -*-
+"""Test the queued logging."""
+
+import logging
+import typing as T
+
+from kofi.log import BoundedQueueHandler, dropped_records, setup_log, stop_log
+
+
+def test_setup_log(capsys: T.Any) -> None:
+    """Records are written by the listener thread."""
+    logger = setup_log({"level": "INFO", "syslog": False, "queue_size": 10})
+    logger.info("Received request for %s", "RSSMRA99E05H501A")
+    logger.debug("Not written")
+    stop_log()
+    out = capsys.readouterr().out
+    assert "Received request for RSSMRA99E05H501A" in out
+    assert "Not written" not in out
+    assert dropped_records() == 0
+
+
+def test_queue_full() -> None:
+    """Records are dropped and counted when the queue is full."""
+    handler = BoundedQueueHandler(1)
+    for message in ("first %s", "second %s"):
+        handler.handle(logging.makeLogRecord({"msg": message, "args": ("x",)}))
+    assert handler.dropped == 1
+    record = handler.queue.get_nowait()
+    # Formatting is left to the listener thread.
+    assert (record.msg, record.args) == ("first %s", ("x",))
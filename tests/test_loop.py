@@ -0,0 +1,38 @@
+# -*- encoding: utf-8 -*-
+"""Test the event loop setup."""
+
+import asyncio
+import logging
+import typing as T
+from unittest import mock
+
+import pytest
+
+from kofi import loop
+
+
+@pytest.fixture
+def policy() -> None:
+    default = asyncio.get_event_loop_policy()
+    # A fresh policy, as the loop of the policy in use may have been unset.
+    asyncio.set_event_loop_policy(None)
+    yield
+    asyncio.set_event_loop_policy(default)
+
+
+@pytest.mark.skipif(loop.uvloop is None, reason="uvloop is not installed")
+def test_uvloop(policy: None) -> None:
+    """The uvloop policy is installed."""
+    event_loop = loop.setup_loop("uvloop", logging.getLogger())
+    assert isinstance(event_loop, loop.uvloop.Loop)
+    event_loop.close()
+
+
+def test_uvloop_fallback(policy: None, caplog: T.Any) -> None:
+    """The asyncio loop is used when uvloop is not installed."""
+    default = asyncio.get_event_loop_policy()
+    with mock.patch("kofi.loop.uvloop", None):
+        event_loop = loop.setup_loop("uvloop", logging.getLogger())
+    assert asyncio.get_event_loop_policy() is default
+    assert isinstance(event_loop, asyncio.AbstractEventLoop)
+    assert "uvloop is not installed" in caplog.text
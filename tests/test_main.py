@@ -0,0 +1,32 @@
+# -*- encoding: utf-8 -*-
+"""Test the webserver entrypoint."""
+
+from asyncio import AbstractEventLoop
+from json import JSONDecoder
+import py  # type: ignore
+
+import aiohttp
+from aiohttp import web
+
+from kofi.config import DEFAULT
+from kofi.main import bind_unix_socket, setup as setup_app
+
+
+async def test_unix_socket(loop: AbstractEventLoop, tmpdir: py.path.local) -> None:
+    """The application is served on a unix socket, replacing a stale one."""
+    path = str(tmpdir.join("kofi.sock"))
+    bind_unix_socket(path).close()
+    sock = bind_unix_socket(path)
+    runner = web.AppRunner(setup_app({**DEFAULT, "unix_socket": path}, loop))
+    await runner.setup()
+    await web.SockSite(runner, sock).start()
+    try:
+        connector = aiohttp.UnixConnector(path=path)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            async with session.get(
+                "http://kofi/api/verify?cf=RSSMRA99E05H501A"
+            ) as resp:
+                body = JSONDecoder().decode(await resp.text())
+    finally:
+        await runner.cleanup()
+    assert body["isCorrect"] is True
@@ -0,0 +1,37 @@
+# -*- encoding: utf-8 -*-
+"""Test the metrics registry."""
+
+from kofi.metrics import Histogram, Metrics
+
+
+def test_histogram() -> None:
+    """Values are counted in cumulative buckets."""
+    histogram = Histogram([0.1, 1])
+    for value in (0.05, 0.1, 0.5, 2):
+        histogram.observe(value)
+    assert list(histogram.samples("h", 'a="b"')) == [
+        ("h_bucket", 'a="b",le="0.1"', 2),
+        ("h_bucket", 'a="b",le="1"', 3),
+        ("h_bucket", 'a="b",le="+Inf"', 4),
+        ("h_sum", 'a="b"', 2.65),
+        ("h_count", 'a="b"', 4),
+    ]
+
+
+def test_render() -> None:
+    """The metrics are rendered in the Prometheus text format."""
+    metrics = Metrics([1])
+    metrics.observe_request("/api/verify", "GET", 200, 0.5)
+    metrics.observe_request("/api/verify", "GET", 200, 0.5)
+    metrics.observe_field("verify", 2)
+    lines = metrics.render().splitlines()
+    assert (
+        'kofi_requests_total{route="/api/verify",method="GET",status="200"} 2' in lines
+    )
+    assert 'kofi_request_duration_seconds_bucket{route="/api/verify",le="1"} 2' in lines
+    assert (
+        'kofi_graphql_field_duration_seconds_bucket{field="verify",le="1"} 0' in lines
+    )
+    assert "# TYPE kofi_request_duration_seconds histogram" in lines
+    metrics.configure([1])
+    assert "kofi_requests_total{" not in metrics.render()
@@ -0,0 +1,123 @@
+# -*- encoding: utf-8 -*-
+"""Test the index of the places of birth."""
+
+import typing as T
+from unittest import mock
+
+from codicefiscale import codicefiscale
+import pytest
+
+from kofi.places import PlaceIndex, setup_places
+
+
+@pytest.fixture(scope="module")
+def index() -> PlaceIndex:
+    index = PlaceIndex(100)
+    index.build()
+    return index
+
+
+@pytest.mark.parametrize(
+    "place",
+    [
+        "Roma",
+        "ROMA",
+        "milano",
+        "Reggio Nell'Emilia",
+        "Sant'Antonio di Gallura",
+        "Francia",
+        "Roma (RM)",
+        "roma, lazio",
+        "H501",
+        "  Roma ",
+    ],
+)
+def test_resolve(index: PlaceIndex, place: T.Text) -> None:
+    """The index agrees with the library."""
+    assert index.resolve(place) == codicefiscale.encode_birthplace(place)
+
+
+@pytest.mark.parametrize("place", ["Nowhere", "", "Romaa"])
+def test_resolve_unknown(index: PlaceIndex, place: T.Text) -> None:
+    """Unknown places raise the library error."""
+    with pytest.raises(ValueError) as e:
+        codicefiscale.encode_birthplace(place)
+    with pytest.raises(ValueError) as index_e:
+        index.resolve(place)
+    assert str(index_e.value) == str(e.value)
+
+
+def test_resolve_without_slugify(index: PlaceIndex) -> None:
+    """Known names and already seen strings skip the library."""
+    index.resolve("roma (rm)")
+    with mock.patch(
+        "kofi.places.codicefiscale.encode_birthplace", side_effect=AssertionError
+    ):
+        assert index.resolve("Milano") == "F205"
+        assert index.resolve("NAPOLI") == "F839"
+        assert index.resolve("roma (rm)") == "H501"
+
+
+def test_setup_places_builds_once() -> None:
+    """The index is built on the first setup only."""
+    places = setup_places({"size": 10})
+    assert len(places) > 10000
+    with mock.patch.object(PlaceIndex, "build") as build:
+        assert setup_places({"size": 10}) is places
+    build.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "prefix, names",
+    [
+        ["Roma", ["ROMA", "ROMAGNANO", "ROMAGNANO AL MONTE"]],
+        ["reggio n", ["REGGIO NELL'EMILIA"]],
+        ["SANT'AGATA DE", ["SANT'AGATA DE' GOTI", "SANT'AGATA DEL BIANCO"]],
+        ["Franc", ["FRANCAVILLA AL MARE", "FRANCAVILLA ANGITOLA"]],
+        ["xyzzy", []],
+        ["--", []],
+    ],
+)
+def test_search(index: PlaceIndex, prefix: T.Text, names: T.List[T.Text]) -> None:
+    """Places are found by prefix, in alphabetical order."""
+    found = index.search(prefix, len(names) or 3)
+    assert [place.name for place in found] == names
+
+
+def test_search_limit(index: PlaceIndex) -> None:
+    """The number of results is bounded, even for one letter prefixes."""
+    found = index.search("a", 7)
+    assert len(found) == 7
+    assert all(place.name.startswith("A") for place in found)
+    countries = index.search("francia", 10)
+    assert [(place.province, place.code) for place in countries] == [("EE", "Z110")]
+
+
+@pytest.mark.parametrize(
+    "place, name, code",
+    [
+        ["Milno", "MILANO", "F205"],
+        ["Napolli", "NAPOLI", "F839"],
+        ["Reggio Emilia", "REGGIO NELL'EMILIA", "H223"],
+        ["San Giovani Rotondo", "SAN GIOVANNI ROTONDO", "H926"],
+        ["Gemania", "GERMANIA", "Z112"],
+    ],
+)
+def test_match(index: PlaceIndex, place: T.Text, name: T.Text, code: T.Text) -> None:
+    """Misspelt places are matched with the most similar name."""
+    match = index.match(place)
+    assert (match.name, match.code) == (name, code)
+    assert 0 < match.score < 1
+    assert index.match(place) == match
+
+
+def test_match_known(index: PlaceIndex) -> None:
+    """Known places are resolved as they are."""
+    assert tuple(index.match("Roma (RM)")) == ("Roma (RM)", "H501", 1.0)
+
+
+@pytest.mark.parametrize("place", ["xyzzy", "Rma", ""])
+def test_match_unknown(index: PlaceIndex, place: T.Text) -> None:
+    """Places not similar enough to any name are not matched."""
+    with pytest.raises(ValueError):
+        index.match(place)
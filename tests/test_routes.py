@@ -1,8 +1,11 @@
 # -*- encoding: utf-8 -*-
 """Test the routes defined in kofi.routes"""
 
+import asyncio
 from asyncio import AbstractEventLoop, get_running_loop
 from contextlib import closing
+import hashlib
+import json
 from json import JSONDecoder
 import socket
 import typing as T
@@ -12,7 +15,8 @@ from aiohttp import web
 import pytest
 import pytest_aiohttp
 
-from kofi.config import DEFAULT_LOG_CONF
+from kofi import codes, rest
+from kofi.config import DEFAULT, DEFAULT_LOG_CONF
 from kofi.main import setup as setup_app
 
 
@@ -25,6 +29,7 @@ def find_free_port():
 
 
 CONF = {
+    **DEFAULT,
     "host": "127.0.0.1",
     "port": find_free_port(),
     "log": DEFAULT_LOG_CONF,
@@ -68,6 +73,156 @@ async def test_rest_verify(
     assert resp.get("isOmocode") == is_omocode
 
 
+async def test_rest_verify_batch(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """Test the /api/verify/batch REST endpoint."""
+    app = get_app(loop)
+    client = await aiohttp_client(app)
+    cfs = ["RSSMRA99E05H501A", "RSSMRA99E05H50GP", "BCDFGH12A55Z123F"]
+    resp_blob = await client.post("/api/verify/batch", json=cfs)
+    assert resp_blob.status == 200
+    resp = JSONDecoder().decode(await resp_blob.text())
+    assert resp == [
+        {"isCorrect": True, "isOmocode": False, "cf": "RSSMRA99E05H501A"},
+        {"isCorrect": True, "isOmocode": True, "cf": "RSSMRA99E05H50GP"},
+        {"isCorrect": False, "isOmocode": False, "cf": "BCDFGH12A55Z123F"},
+    ]
+
+
+async def test_rest_verify_batch_ndjson(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """Test the /api/verify/batch REST endpoint with NDJSON input."""
+    app = get_app(loop)
+    client = await aiohttp_client(app)
+    resp_blob = await client.post(
+        "/api/verify/batch",
+        data='"RSSMRA99E05H50GP"\n\n"RSSMRA99E05H501A"\n',
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert resp_blob.status == 200
+    resp = JSONDecoder().decode(await resp_blob.text())
+    assert [item["cf"] for item in resp] == ["RSSMRA99E05H50GP", "RSSMRA99E05H501A"]
+    assert [item["isOmocode"] for item in resp] == [True, False]
+
+
+async def test_rest_verify_stream(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """Test the /api/verify/stream REST endpoint."""
+    app = get_app(loop)
+    client = await aiohttp_client(app)
+    resp_blob = await client.post(
+        "/api/verify/stream",
+        data='"RSSMRA99E05H50GP"\n\n42\n"BCDFGH12A55Z123F"\n"RSSMRA99E05H501A"',
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert resp_blob.status == 200
+    assert resp_blob.content_type == "application/x-ndjson"
+    lines = (await resp_blob.text()).splitlines()
+    resp = [JSONDecoder().decode(line) for line in lines]
+    assert resp == [
+        {"isCorrect": True, "isOmocode": True, "cf": "RSSMRA99E05H50GP"},
+        {
+            "error": "malformed request",
+            "error_msg": "Line 1 is not a codice fiscale string",
+        },
+        {"isCorrect": False, "isOmocode": False, "cf": "BCDFGH12A55Z123F"},
+        {"isCorrect": True, "isOmocode": False, "cf": "RSSMRA99E05H501A"},
+    ]
+
+
+async def test_rest_verify_stream_long_line(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """Overlong lines get an error line, and the stream goes on."""
+    app = get_app(loop)
+    client = await aiohttp_client(app)
+    long_line = '"' + "A" * 300000 + '"'
+    resp_blob = await client.post(
+        "/api/verify/stream",
+        data="\n".join(
+            ['"RSSMRA99E05H50GP"', long_line, '"RSSMRA99E05H501A"', long_line]
+        ),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert resp_blob.status == 200
+    resp = [
+        JSONDecoder().decode(line) for line in (await resp_blob.text()).splitlines()
+    ]
+    assert [item.get("cf") for item in resp] == [
+        "RSSMRA99E05H50GP",
+        None,
+        "RSSMRA99E05H501A",
+        None,
+    ]
+    assert resp[1]["error_msg"] == "Line 1 is longer than 65536 bytes"
+
+
+async def test_rest_interpolate_batch_large(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """Bodies fitting a full batch are accepted, larger ones get a JSON error."""
+    app = get_app(loop)
+    client = await aiohttp_client(app)
+    record = {
+        "name": "Mario",
+        "surname": "Rossi",
+        "gender": "M",
+        "date_of_birth": "1999-05-05",
+        "place_of_birth": "Sant'Antonio di Gallura",
+        "notes": "x" * 60,
+    }
+    body = json.dumps([record] * 9000)
+    assert len(body) > 2 ** 20
+    resp_blob = await client.post(
+        "/api/interpolate/batch",
+        data=body,
+        headers={"Content-Type": "application/json"},
+    )
+    assert resp_blob.status == 200
+    assert len(JSONDecoder().decode(await resp_blob.text())) == 9000
+
+    app = setup_app({**CONF, "max_batch_size": 10}, loop)
+    client = await aiohttp_client(app)
+    resp_blob = await client.post(
+        "/api/verify/batch", data=body, headers={"Content-Type": "application/json"},
+    )
+    assert resp_blob.status == 413
+    resp = JSONDecoder().decode(await resp_blob.text())
+    assert resp["error"] == "batch too large"
+
+
+@pytest.mark.parametrize(
+    "body,status",
+    [
+        ['{"cf": "RSSMRA99E05H501A"}', 400],
+        ["[not json", 400],
+        ['["RSSMRA99E05H501A", 12]', 400],
+        ['["RSSMRA99E05H501A", ""]', 400],
+        ['["RSSMRA99E05H501A", "RSSMRA99E05H50GP", "BCDFGH12A55Z123F"]', 413],
+    ],
+)
+async def test_rest_verify_batch_err(
+    loop: AbstractEventLoop,
+    aiohttp_client: pytest_aiohttp.TestClient,
+    body: T.Text,
+    status: int,
+) -> None:
+    """Test the /api/verify/batch REST endpoint with wrong input."""
+    conf = CONF.copy()
+    conf["max_batch_size"] = 2
+    app = setup_app(conf, loop)
+    client = await aiohttp_client(app)
+    resp_blob = await client.post(
+        "/api/verify/batch", data=body, headers={"Content-Type": "application/json"},
+    )
+    assert resp_blob.status == status
+    resp = JSONDecoder().decode(await resp_blob.text())
+    assert "error_msg" in resp
+
+
 async def test_rest_interpolate(
     loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
 ) -> None:
@@ -82,6 +237,28 @@ async def test_rest_interpolate(
     assert resp["cf"] == "RSSMRA99E05H501A"
 
 
+async def test_rest_interpolate_fuzzy(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """Test the /api/interpolate REST endpoint with a misspelt place of birth."""
+    app = get_app(loop)
+    client = await aiohttp_client(app)
+    query_string = "name=Mario&surname=Rossi&gender=M&date_of_birth=1999-05-05"
+    resp_blob = await client.get(
+        f"/api/interpolate?{query_string}&place_of_birth=Milno"
+    )
+    assert resp_blob.status == 400
+    resp_blob = await client.get(
+        f"/api/interpolate?{query_string}&place_of_birth=Milno&fuzzy=true"
+    )
+    assert resp_blob.status == 200
+    resp = JSONDecoder().decode(await resp_blob.text())
+    assert resp["cf"] == "RSSMRA99E05F205D"
+    assert resp["place_of_birth"]["name"] == "MILANO"
+    assert resp["place_of_birth"]["code"] == "F205"
+    assert 0 < resp["place_of_birth"]["score"] < 1
+
+
 @pytest.mark.parametrize(
     "query_string",
     [
@@ -107,6 +284,144 @@ async def test_rest_interpolate_err(
     assert "error_msg" in resp
 
 
+async def test_rest_interpolate_batch(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """Test the /api/interpolate/batch REST endpoint."""
+    app = get_app(loop)
+    client = await aiohttp_client(app)
+    mario = {
+        "name": "Mario",
+        "surname": "Rossi",
+        "gender": "M",
+        "date_of_birth": "1999-05-05",
+        "place_of_birth": "Roma",
+    }
+    maria = {
+        "name": "Maria",
+        "surname": "Bianchi",
+        "gender": "F",
+        "date_of_birth": "1970-12-27",
+        "place_of_birth": "Milano",
+    }
+    records = [
+        mario,
+        {**mario, "place_of_birth": "Nowhere"},
+        maria,
+        {**mario, "gender": "X"},
+        {key: val for key, val in maria.items() if key != "surname"},
+        "Mario Rossi",
+        {**mario, "date_of_birth": "99999999999-05-05"},
+    ]
+    resp_blob = await client.post("/api/interpolate/batch", json=records)
+    assert resp_blob.status == 200
+    resp = JSONDecoder().decode(await resp_blob.text())
+    assert len(resp) == len(records)
+    assert resp[0] == {"cf": "RSSMRA99E05H501A"}
+    assert resp[2] == {"cf": "BNCMRA70T67F205L"}
+    for idx in (1, 3, 4, 5, 6):
+        assert resp[idx]["error"] == "malformed request"
+    assert "birthplace" in resp[1]["error_msg"]
+    assert "99999999999-05-05" in resp[6]["error_msg"]
+    assert "surname" in resp[4]["error_msg"]
+
+
+@pytest.mark.parametrize("mode", ["thread", "process"])
+async def test_executor(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient, mode: T.Text
+) -> None:
+    """Test the endpoints with the computations offloaded to a pool."""
+    app = setup_app({**CONF, "executor": {"mode": mode, "max_workers": 2}}, loop)
+    client = await aiohttp_client(app)
+    resp_blob = await client.post(
+        "/api/verify/batch", json=["RSSMRA99E05H501A", "BCDFGH12A55Z123F"]
+    )
+    resp = JSONDecoder().decode(await resp_blob.text())
+    assert [item["isCorrect"] for item in resp] == [True, False]
+    query_string = "name=Mario&surname=Rossi&gender=M&date_of_birth=1999-05-05"
+    resp_blob = await client.get(f"/api/interpolate?{query_string}&place_of_birth=Roma")
+    resp = JSONDecoder().decode(await resp_blob.text())
+    assert resp == {"cf": "RSSMRA99E05H501A"}
+    resp_blob = await client.get(
+        f"/api/interpolate?{query_string}&place_of_birth=Rooma&fuzzy=true"
+    )
+    resp = JSONDecoder().decode(await resp_blob.text())
+    assert resp["cf"] == "RSSMRA99E05H501A"
+    resp_blob = await client.get(f"/api/interpolate?{query_string}&place_of_birth=X")
+    assert resp_blob.status == 400
+    query = """{ interpolate(name: "Mario", surname: "Rossi", gender: M,
+        dateOfBirth: "1999-05-05", placeOfBirth: "Roma") { codiceFiscale } }"""
+    resp_blob = await client.post("/graphql", json={"query": query})
+    resp = JSONDecoder().decode(await resp_blob.text())
+    assert resp["data"]["interpolate"]["codiceFiscale"] == "RSSMRA99E05H501A"
+
+
+async def test_rest_interpolate_batch_too_large(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """Test the /api/interpolate/batch REST endpoint size limit."""
+    conf = CONF.copy()
+    conf["max_batch_size"] = 1
+    app = setup_app(conf, loop)
+    client = await aiohttp_client(app)
+    resp_blob = await client.post("/api/interpolate/batch", json=[{}, {}])
+    assert resp_blob.status == 413
+
+
+async def test_rest_places(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """Test the /api/places REST endpoint."""
+    app = get_app(loop)
+    client = await aiohttp_client(app)
+    resp_blob = await client.get("/api/places?prefix=rom&limit=2")
+    assert resp_blob.status == 200
+    resp = JSONDecoder().decode(await resp_blob.text())
+    assert resp == [
+        {"name": "ROMA", "province": "RM", "code": "H501"},
+        {"name": "ROMAGNANO", "province": "TN", "code": "H504"},
+    ]
+
+
+@pytest.mark.parametrize(
+    "query_string", ["", "prefix=", "prefix=rom&limit=0", "prefix=rom&limit=many"]
+)
+async def test_rest_places_err(
+    loop: AbstractEventLoop,
+    aiohttp_client: pytest_aiohttp.TestClient,
+    query_string: T.Text,
+) -> None:
+    """Test the /api/places REST endpoint with wrong input."""
+    app = get_app(loop)
+    client = await aiohttp_client(app)
+    resp_blob = await client.get(f"/api/places?{query_string}")
+    assert resp_blob.status == 400
+    resp = JSONDecoder().decode(await resp_blob.text())
+    assert resp["error"] == "malformed request"
+
+
+async def test_rest_cache_stats(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """Test that REST and GraphQL share the result caches."""
+    app = get_app(loop)
+    client = await aiohttp_client(app)
+    await client.get("/api/verify?cf=RSSMRA99E05H501A")
+    await client.get("/api/verify?cf=RSSMRA99E05H501A")
+    await client.post(
+        "/graphql",
+        data='query { verify(cf: "RSSMRA99E05H501A"){ isCorrect } }',
+        headers={"Content-Type": "application/graphql"},
+    )
+    resp_blob = await client.get("/api/cache/stats")
+    resp = JSONDecoder().decode(await resp_blob.text())
+    assert resp["verify"]["entries"] == 1
+    assert resp["verify"]["misses"] == 1
+    assert resp["verify"]["hits"] == 2
+    assert resp["interpolate"]["entries"] == 0
+    assert resp["documents"]["entries"] == 1
+
+
 @pytest.mark.parametrize(
     "cf,is_correct,is_omocode",
     [
@@ -194,3 +509,442 @@ async def test_no_graphiql(
     resp_json = await resp_blob.text()
     resp = JSONDecoder().decode(resp_json)
     assert resp["errors"][0]["message"] == "Must provide query string."
+
+
+async def test_graphql_persisted_query(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """Test persisted queries, registered by POST and run by GET."""
+    app = get_app_no_graphiql(loop)
+    client = await aiohttp_client(app)
+    query = "query check($cf: String!) { verify(cf: $cf) { isCorrect } }"
+    extensions = {
+        "persistedQuery": {
+            "version": 1,
+            "sha256Hash": hashlib.sha256(query.encode()).hexdigest(),
+        }
+    }
+    params = {
+        "extensions": json.dumps(extensions),
+        "variables": json.dumps({"cf": "RSSMRA99E05H501A"}),
+    }
+    resp_blob = await client.get("/graphql", params=params)
+    resp = JSONDecoder().decode(await resp_blob.text())
+    assert resp["errors"][0]["message"] == "PersistedQueryNotFound"
+    resp_blob = await client.post(
+        "/graphql",
+        json={
+            "query": query,
+            "variables": {"cf": "RSSMRA99E05H501A"},
+            "extensions": extensions,
+        },
+    )
+    resp = JSONDecoder().decode(await resp_blob.text())
+    assert resp["data"]["verify"]["isCorrect"] is True
+    resp_blob = await client.get("/graphql", params=params)
+    assert resp_blob.status == 200
+    resp = JSONDecoder().decode(await resp_blob.text())
+    assert resp["data"]["verify"]["isCorrect"] is True
+
+
+async def test_graphql_persisted_query_wrong_hash(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """Queries are not registered under a wrong hash."""
+    app = get_app_no_graphiql(loop)
+    client = await aiohttp_client(app)
+    resp_blob = await client.post(
+        "/graphql",
+        json={
+            "query": '{ verify(cf: "RSSMRA99E05H501A") { isCorrect } }',
+            "extensions": {"persistedQuery": {"version": 1, "sha256Hash": "0" * 64}},
+        },
+    )
+    assert resp_blob.status == 400
+    resp = JSONDecoder().decode(await resp_blob.text())
+    assert "hash does not match" in resp["errors"][0]["message"]
+
+
+async def test_graphql_batch(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """Test an array of GraphQL operations in one request."""
+    app = get_app_no_graphiql(loop)
+    client = await aiohttp_client(app)
+    query = "query check($cf: String!) { verify(cf: $cf) { isCorrect } }"
+    resp_blob = await client.post(
+        "/graphql",
+        json=[
+            {"query": query, "variables": {"cf": "RSSMRA99E05H501A"}},
+            {"query": query, "variables": {"cf": "BCDFGH12A55Z123F"}},
+        ],
+    )
+    assert resp_blob.status == 200
+    resp = JSONDecoder().decode(await resp_blob.text())
+    assert [item["data"]["verify"]["isCorrect"] for item in resp] == [True, False]
+
+
+async def test_graphql_batch_too_large(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """Test that arrays of operations are bounded."""
+    limits = {**CONF["query_limits"], "max_operations": 2}
+    app = setup_app({**CONF, "max_batch_size": 10, "query_limits": limits}, loop)
+    client = await aiohttp_client(app)
+    query = {"query": '{ verify(cf: "RSSMRA99E05H501A") { isCorrect } }'}
+    resp_blob = await client.post("/graphql", json=[query] * 3)
+    assert resp_blob.status == 413
+
+
+async def test_graphql_query_limits(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """Operations over the query limits are rejected."""
+    limits = {**CONF["query_limits"], "max_aliases": 1}
+    app = setup_app({**CONF, "graphiql": False, "query_limits": limits}, loop)
+    client = await aiohttp_client(app)
+    verify = 'verify(cf: "RSSMRA99E05H501A") { isCorrect }'
+    resp_blob = await client.post("/graphql", json={"query": f"{{ a: {verify} }}"})
+    assert resp_blob.status == 200
+    query = f"{{ a: {verify} b: {verify} }}"
+    resp_blob = await client.post("/graphql", json={"query": query})
+    assert resp_blob.status == 400
+    resp = JSONDecoder().decode(await resp_blob.text())
+    assert "aliases 2 exceed the maximum of 1" in resp["errors"][0]["message"]
+    deep = "fields { type { " * 30 + "name" + " } }" * 30
+    query = f"{{ __schema {{ types {{ {deep} }} }} }}"
+    resp_blob = await client.post("/graphql", json={"query": query})
+    assert resp_blob.status == 400
+    resp = JSONDecoder().decode(await resp_blob.text())
+    assert "Introspection depth 63 exceeds" in resp["errors"][0]["message"]
+
+
+async def test_graphql_batch_query_limits(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """The operations of a batch are checked against the limits together."""
+    limits = {**CONF["query_limits"], "max_cost": 30}
+    app = setup_app({**CONF, "graphiql": False, "query_limits": limits}, loop)
+    client = await aiohttp_client(app)
+    fields = " ".join(
+        f'a{idx}: interpolate(name: "Mario", surname: "Rossi", gender: M,'
+        f' dateOfBirth: "1999-05-05", placeOfBirth: "Roma") {{ codiceFiscale }}'
+        for idx in range(2)
+    )
+    operation = {"query": f"{{ {fields} }}"}
+    resp_blob = await client.post("/graphql", json=[operation])
+    assert resp_blob.status == 200
+    with mock.patch("kofi.codes.encode") as encode:
+        resp_blob = await client.post("/graphql", json=[operation] * 2)
+    assert resp_blob.status == 400
+    resp = JSONDecoder().decode(await resp_blob.text())
+    assert resp["errors"][0]["message"] == "Batch cost 44 exceeds the maximum of 30"
+    encode.assert_not_called()
+
+
+async def test_metrics(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """The requests and the GraphQL fields are measured."""
+    app = get_app_no_graphiql(loop)
+    client = await aiohttp_client(app)
+    await client.get("/api/verify", params={"cf": "RSSMRA99E05H501A"})
+    await client.get("/api/verify")
+    await client.get("/nowhere")
+    query = '{ verify(cf: "RSSMRA99E05H501A") { isCorrect } }'
+    await client.post("/graphql", json={"query": query})
+    resp_blob = await client.get("/metrics")
+    assert resp_blob.status == 200
+    text = await resp_blob.text()
+    for sample in (
+        'kofi_requests_total{route="/api/verify",method="GET",status="200"} 1',
+        'kofi_requests_total{route="/api/verify",method="GET",status="400"} 1',
+        'kofi_requests_total{route="unmatched",method="GET",status="404"} 1',
+        'kofi_request_duration_seconds_count{route="/graphql"} 1',
+        'kofi_graphql_field_duration_seconds_count{field="verify"} 1',
+        'kofi_cache_misses_total{cache="verify"} 1',
+        "kofi_coalesced_total ",
+    ):
+        assert sample in text
+
+
+async def test_metrics_disabled(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """The metrics can be turned off."""
+    metrics = {"enabled": False, "buckets": [1]}
+    app = setup_app({**CONF, "metrics": metrics}, loop)
+    client = await aiohttp_client(app)
+    resp_blob = await client.get("/metrics")
+    assert resp_blob.status == 404
+
+
+def _server_timing(header: T.Text) -> T.List[T.Text]:
+    return [metric.split(";")[0] for metric in header.split(", ")]
+
+
+async def test_server_timing(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """The phases of the sampled requests are reported."""
+    timing = {"enabled": True, "sample_percent": 100}
+    app = setup_app({**CONF, "graphiql": False, "server_timing": timing}, loop)
+    client = await aiohttp_client(app)
+    resp_blob = await client.get(
+        "/api/interpolate",
+        params={
+            "name": "Mario",
+            "surname": "Rossi",
+            "gender": "M",
+            "date_of_birth": "1999-05-05",
+            "place_of_birth": "Milno",
+            "fuzzy": "true",
+        },
+    )
+    assert resp_blob.status == 200
+    assert _server_timing(resp_blob.headers["Server-Timing"]) == [
+        "lookup",
+        "encode",
+        "serialize",
+        "total",
+    ]
+    resp_blob = await client.get(
+        "/api/interpolate",
+        params={
+            "name": "Mario",
+            "surname": "Rossi",
+            "gender": "M",
+            "date_of_birth": "1999-05-05",
+            "place_of_birth": "Milano",
+        },
+    )
+    assert resp_blob.status == 200
+    assert _server_timing(resp_blob.headers["Server-Timing"]) == [
+        "lookup",
+        "encode",
+        "serialize",
+        "total",
+    ]
+    query = '{ verify(cf: "RSSMRA99E05H501A") { isCorrect } }'
+    resp_blob = await client.post("/graphql", json={"query": query})
+    assert _server_timing(resp_blob.headers["Server-Timing"]) == [
+        "read",
+        "parse",
+        "verify",
+        "serialize",
+        "total",
+    ]
+
+
+async def test_server_timing_sampling(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """Requests out of the sample are not timed."""
+    timing = {"enabled": True, "sample_percent": 0}
+    app = setup_app({**CONF, "server_timing": timing}, loop)
+    client = await aiohttp_client(app)
+    resp_blob = await client.get("/api/verify", params={"cf": "RSSMRA99E05H501A"})
+    assert resp_blob.status == 200
+    assert "Server-Timing" not in resp_blob.headers
+
+
+async def test_graphql_dedup(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """Identical computations are run once per request."""
+    app = get_app_no_graphiql(loop)
+    client = await aiohttp_client(app)
+    interpolate = (
+        'interpolate(name: "Mario", surname: "Rossi", gender: M, '
+        'dateOfBirth: "1999-05-05", placeOfBirth: "{}") {{ codiceFiscale }}'
+    )
+    query = "{{ a: {0} b: {0} c: {1} }}".format(
+        interpolate.format("Roma"), interpolate.format("Milano")
+    )
+    with mock.patch("kofi.codes.encode", wraps=codes.encode) as encode:
+        resp_blob = await client.post(
+            "/graphql", json=[{"query": query}, {"query": query}]
+        )
+    resp = JSONDecoder().decode(await resp_blob.text())
+    for item in resp:
+        assert item["data"]["a"] == item["data"]["b"] != item["data"]["c"]
+    assert encode.call_count == 2
+
+
+async def test_graphql_async(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """The resolvers let the other requests run while computing aliases."""
+    app = get_app_no_graphiql(loop)
+    client = await aiohttp_client(app)
+    order = []
+    encode = codes.encode
+
+    def tracked_encode(*args: T.Any) -> T.Text:
+        order.append("interpolate")
+        return encode(*args)
+
+    def tracked_verify(cf: T.Text) -> T.Tuple[bool, bool]:
+        order.append("verify")
+        return verify(cf)
+
+    aliases = " ".join(
+        f'a{idx}: interpolate(name: "Mario", surname: "Rossi", gender: M, '
+        f'dateOfBirth: "1999-05-{idx + 1:02d}", placeOfBirth: "Roma") '
+        "{ codiceFiscale }"
+        for idx in range(20)
+    )
+    verify = codes.verify
+    with mock.patch("kofi.codes.encode", tracked_encode), mock.patch(
+        "kofi.codes.verify", tracked_verify
+    ):
+        graphql_resp, verify_resp = await asyncio.gather(
+            client.post("/graphql", json={"query": f"{{ {aliases} }}"}),
+            client.get("/api/verify?cf=RSSMRA99E05H501A"),
+        )
+    assert graphql_resp.status == verify_resp.status == 200
+    assert order.index("verify") < len(order) - 1
+
+
+async def test_conditional_get(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """Deterministic responses are tagged, and not computed again if fresh."""
+    app = get_app(loop)
+    client = await aiohttp_client(app)
+    params = {"cf": "RSSMRA99E05H501A"}
+    resp_blob = await client.get("/api/verify", params=params)
+    assert resp_blob.status == 200
+    assert resp_blob.headers["Cache-Control"] == "public, max-age=3600"
+    tag = resp_blob.headers["ETag"]
+    for if_none_match in (tag, f"W/{tag}", f'"other", {tag}'):
+        with mock.patch("kofi.codes.verify") as verify:
+            resp_blob = await client.get(
+                "/api/verify", params=params, headers={"If-None-Match": if_none_match}
+            )
+        assert resp_blob.status == 304
+        assert resp_blob.headers["ETag"] == tag
+        verify.assert_not_called()
+    resp_blob = await client.get(
+        "/api/verify",
+        params={"cf": "RSSMRA99E05H50GP"},
+        headers={"If-None-Match": tag},
+    )
+    assert resp_blob.status == 200
+    assert resp_blob.headers["ETag"] != tag
+
+    params = {
+        "name": "Mario",
+        "surname": "Rossi",
+        "gender": "M",
+        "date_of_birth": "1999-05-05",
+        "place_of_birth": "Roma",
+    }
+    resp_blob = await client.get("/api/interpolate", params=params)
+    tag = resp_blob.headers["ETag"]
+    resp_blob = await client.get("/api/interpolate", params={**params, "fuzzy": "true"})
+    assert resp_blob.headers["ETag"] != tag
+    resp_blob = await client.get(
+        "/api/interpolate", params=params, headers={"If-None-Match": tag}
+    )
+    assert resp_blob.status == 304
+    resp_blob = await client.get(
+        "/api/interpolate",
+        params={**params, "place_of_birth": "Nowhere"},
+        headers={"If-None-Match": "*"},
+    )
+    assert resp_blob.status == 400
+    assert "ETag" not in resp_blob.headers
+    assert "Cache-Control" not in resp_blob.headers
+
+
+async def test_conditional_get_disabled(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """Responses are not tagged when HTTP caching is disabled."""
+    http_cache = {"enabled": False, "max_age": 3600}
+    app = setup_app({**CONF, "graphiql": False, "http_cache": http_cache}, loop)
+    client = await aiohttp_client(app)
+    resp_blob = await client.get(
+        "/api/verify",
+        params={"cf": "RSSMRA99E05H501A"},
+        headers={"If-None-Match": "*"},
+    )
+    assert resp_blob.status == 200
+    assert "ETag" not in resp_blob.headers
+
+
+async def test_graphql_persisted_query_conditional_get(
+    loop: AbstractEventLoop, aiohttp_client: pytest_aiohttp.TestClient
+) -> None:
+    """Persisted queries run by GET are tagged, and not run again if fresh."""
+    http_cache = {"enabled": True, "max_age": 0}
+    app = setup_app({**CONF, "graphiql": False, "http_cache": http_cache}, loop)
+    client = await aiohttp_client(app)
+    query = "query check($cf: String!) { verify(cf: $cf) { isCorrect } }"
+    extensions = {
+        "persistedQuery": {
+            "version": 1,
+            "sha256Hash": hashlib.sha256(query.encode()).hexdigest(),
+        }
+    }
+    params = {
+        "extensions": json.dumps(extensions),
+        "variables": json.dumps({"cf": "RSSMRA99E05H501A"}),
+    }
+    resp_blob = await client.get("/graphql", params=params)
+    assert resp_blob.status == 400
+    assert "ETag" not in resp_blob.headers
+    resp_blob = await client.post(
+        "/graphql",
+        json={
+            "query": query,
+            "variables": {"cf": "RSSMRA99E05H501A"},
+            "extensions": extensions,
+        },
+    )
+    assert "ETag" not in resp_blob.headers
+    resp_blob = await client.get("/graphql", params=params)
+    assert resp_blob.status == 200
+    assert resp_blob.headers["Cache-Control"] == "no-cache"
+    tag = resp_blob.headers["ETag"]
+    with mock.patch("kofi.graphql.codes") as codes:
+        resp_blob = await client.get(
+            "/graphql", params=params, headers={"If-None-Match": tag}
+        )
+    assert resp_blob.status == 304
+    codes.verify.assert_not_called()
+    resp_blob = await client.get(
+        "/graphql",
+        params={**params, "variables": json.dumps({"cf": "RSSMRA99E05H50GP"})},
+        headers={"If-None-Match": tag},
+    )
+    assert resp_blob.status == 200
+    assert resp_blob.headers["ETag"] != tag
+
+
+class _Chunks:
+    def __init__(self, chunks: T.List[bytes]) -> None:
+        self.chunks = chunks
+
+    async def iter_any(self) -> T.AsyncIterator[bytes]:
+        for chunk in self.chunks:
+            yield chunk
+
+
+@pytest.mark.parametrize(
+    "chunks, lines",
+    [
+        [[b"ab\ncd", b"e\n", b"f"], [b"ab", b"cde", b"f"]],
+        [[b"ab\n1234", b"56\nc"], [b"ab", None, b"c"]],
+        [[b"123456", b"7\nab\n"], [None, b"ab"]],
+        [[b"12345", b"\nab", b"\n"], [b"12345", b"ab"]],
+        [[b"ab\n123456"], [b"ab", None]],
+    ],
+)
+async def test_read_lines(
+    loop: AbstractEventLoop, chunks: T.List[bytes], lines: T.List[T.Any]
+) -> None:
+    """Lines are split across chunks, the overlong ones skipped."""
+    with mock.patch("kofi.rest.MAX_LINE_SIZE", 5):
+        assert [line async for line in rest._read_lines(_Chunks(chunks))] == lines
@@ -0,0 +1,48 @@
+# -*- encoding: utf-8 -*-
+"""Test the JSON serializers."""
+
+import json
+import logging
+import typing as T
+from unittest import mock
+
+import pytest
+
+from kofi import serializer
+
+DATA = {"cf": "RSSMRA99E05H501A", "place": "FORLÌ/CESENA", "items": [1, 2.5, None]}
+
+
+@pytest.fixture
+def restore() -> None:
+    yield
+    serializer.setup_serializer("json", logging.getLogger())
+
+
+@pytest.mark.parametrize("name", ["orjson", "ujson", "json"])
+def test_serializers(name: T.Text, restore: None) -> None:
+    """All of the serializers write the same JSON."""
+    if name not in serializer._installed():
+        pytest.skip(f"{name} is not installed")
+    assert serializer.setup_serializer(name, logging.getLogger()) == name
+    assert json.loads(serializer.dumps(DATA)) == DATA
+    response = serializer.json_response(DATA, status=400)
+    assert response.status == 400
+    assert response.content_type == "application/json"
+    assert json.loads(response.body) == DATA
+
+
+def test_auto(restore: None) -> None:
+    """The fastest serializer installed is picked."""
+    with mock.patch("kofi.serializer.orjson", None), mock.patch(
+        "kofi.serializer.ujson", None
+    ):
+        assert serializer.setup_serializer("auto", logging.getLogger()) == "json"
+
+
+def test_fallback(restore: None, caplog: T.Any) -> None:
+    """The json module is used when the serializer is not installed."""
+    caplog.set_level(logging.WARNING)
+    with mock.patch("kofi.serializer.orjson", None):
+        assert serializer.setup_serializer("orjson", logging.getLogger()) == "json"
+    assert "orjson is not installed" in caplog.text
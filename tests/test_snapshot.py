@@ -0,0 +1,121 @@
+# -*- encoding: utf-8 -*-
+"""Test the snapshots of the index and of the caches."""
+
+from asyncio import AbstractEventLoop
+import os
+import typing as T
+from unittest import mock
+
+import py  # type: ignore
+import pytest
+from aiohttp import web
+
+from kofi import codes
+from kofi.cache import interpolate_cache, verify_cache
+from kofi.config import DEFAULT
+from kofi.main import setup as setup_app
+from kofi.places import PlaceIndex
+from kofi.snapshot import load_snapshot, restore_caches, write_snapshot
+
+
+@pytest.fixture(scope="module")
+def index() -> PlaceIndex:
+    index = PlaceIndex(100)
+    index.build()
+    return index
+
+
+@pytest.fixture
+def caches() -> T.Iterator[None]:
+    verify_cache.configure(100)
+    interpolate_cache.configure(100)
+    yield
+    verify_cache.configure(0)
+    interpolate_cache.configure(0)
+
+
+@pytest.fixture
+def snapshot_path(tmpdir: py.path.local) -> T.Text:
+    return str(tmpdir.join("kofi.snapshot"))
+
+
+async def test_snapshot(
+    loop: AbstractEventLoop, index: PlaceIndex, caches: None, snapshot_path: T.Text
+) -> None:
+    """The index and the cache entries are restored from the snapshot."""
+    with mock.patch("kofi.places.birthplaces", index):
+        analysis = codes.analyse("RSSMRA99E05H501A")
+        code = codes.resolve_place("Roma (RM)")
+        cf = codes.encode("Rossi", "Mario", "M", "1999-05-05", code)
+        match = index.match("Milno")
+        await write_snapshot(snapshot_path)
+
+    verify_cache.clear()
+    interpolate_cache.clear()
+    restored = PlaceIndex(100)
+    with mock.patch("kofi.places.birthplaces", restored):
+        restore_caches(load_snapshot({"snapshot_path": snapshot_path}))
+
+    assert len(restored) == len(index)
+    assert restored.search("reggio", 5) == index.search("reggio", 5)
+    assert verify_cache.get("RSSMRA99E05H501A") == analysis
+    key = ("Rossi", "Mario", "M", "1999-05-05", "H501")
+    assert interpolate_cache.get(key) == cf
+    with mock.patch("kofi.places.codicefiscale") as library:
+        assert restored.resolve("Roma (RM)") == "H501"
+    library.encode_birthplace.assert_not_called()
+    with mock.patch.object(restored, "_closest") as closest:
+        assert restored.match("Milno") == match
+    closest.assert_not_called()
+
+
+async def test_snapshot_built_index(
+    loop: AbstractEventLoop, index: PlaceIndex, caches: None, snapshot_path: T.Text
+) -> None:
+    """An index already built is not read from the snapshot."""
+    with mock.patch("kofi.places.birthplaces", index):
+        await write_snapshot(snapshot_path)
+        with mock.patch.object(index, "load") as load:
+            assert load_snapshot({"snapshot_path": snapshot_path}) is not None
+    load.assert_not_called()
+
+
+async def test_stale_snapshot(
+    loop: AbstractEventLoop, index: PlaceIndex, caches: None, snapshot_path: T.Text
+) -> None:
+    """Snapshots written by another version are ignored."""
+    with mock.patch("kofi.places.birthplaces", index):
+        await write_snapshot(snapshot_path)
+    restored = PlaceIndex(100)
+    with mock.patch("kofi.places.birthplaces", restored):
+        with mock.patch("kofi.snapshot.FORMAT", 2):
+            assert load_snapshot({"snapshot_path": snapshot_path}) is None
+        with mock.patch("kofi.snapshot.__version__", "0.0.0"):
+            assert load_snapshot({"snapshot_path": snapshot_path}) is None
+    assert not len(restored)
+
+
+@pytest.mark.parametrize("content", [None, b"", b"KOFI", os.urandom(100)])
+def test_unreadable_snapshot(content: T.Optional[bytes], snapshot_path: T.Text) -> None:
+    """Missing and corrupted snapshots are ignored."""
+    if content is not None:
+        with open(snapshot_path, "wb") as f:
+            f.write(content)
+    restored = PlaceIndex(100)
+    with mock.patch("kofi.places.birthplaces", restored):
+        assert load_snapshot({"snapshot_path": snapshot_path}) is None
+        assert load_snapshot({"snapshot_path": None}) is None
+    assert not len(restored)
+
+
+async def test_snapshot_on_shutdown(
+    loop: AbstractEventLoop, snapshot_path: T.Text
+) -> None:
+    """The application writes a snapshot when shut down."""
+    config = {**DEFAULT, "cache": {**DEFAULT["cache"], "snapshot_path": snapshot_path}}
+    runner = web.AppRunner(setup_app(config, loop))
+    await runner.setup()
+    assert not os.path.exists(snapshot_path)
+    await runner.cleanup()
+    assert os.path.exists(snapshot_path)
+    assert load_snapshot(config["cache"]) is not None
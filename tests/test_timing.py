@@ -0,0 +1,27 @@
+# -*- encoding: utf-8 -*-
+"""Test the breakdown of the requests by phase."""
+
+from kofi.timing import Timing, _current, phase
+
+
+def test_timing_header() -> None:
+    """Repeated phases add up, in milliseconds."""
+    timing = Timing()
+    timing.add("encode", 0.001)
+    timing.add("encode", 0.0005)
+    timing.add("serialize", 0.0002)
+    assert timing.header() == "encode;dur=1.500, serialize;dur=0.200"
+
+
+def test_phase() -> None:
+    """Phases are timed only within a sampled request."""
+    with phase("encode"):
+        pass
+    timing = Timing()
+    token = _current.set(timing)
+    try:
+        with phase("encode"):
+            pass
+    finally:
+        _current.reset(token)
+    assert list(timing.phases) == ["encode"]
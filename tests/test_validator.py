@@ -0,0 +1,47 @@
+# -*- encoding: utf-8 -*-
+"""Test the table driven validator."""
+
+import typing as T
+from unittest import mock
+
+from codicefiscale import codicefiscale
+import pytest
+
+from kofi.analysis import analyse, verify_many
+from kofi.validator import bulk_verify, check_char
+from tests.test_analysis import corpus
+
+
+@pytest.mark.parametrize(
+    "body", ["RSSMRA99E05H501", "RSSMRA99E05H50G", "BNCMRA70T67F205", "ZZZZZZ00A00Z000"]
+)
+def test_check_char(body: T.Text) -> None:
+    """The check character matches the library one."""
+    assert check_char(body) == codicefiscale.encode_cin(body)
+
+
+def test_bulk_verify_corpus() -> None:
+    """Bulk verification agrees with the single item analysis."""
+    pytest.importorskip("numpy")
+    cfs = corpus()
+    bulk = bulk_verify(cfs)
+    assert sum(result is not None for result in bulk) > len(cfs) / 2
+    for cf, result in zip(cfs, bulk):
+        if result is not None:
+            assert result == analyse(cf)[1:3], cf
+    assert verify_many(cfs) == [analyse(cf)[1:3] for cf in cfs]
+
+
+def test_bulk_verify_leap_years() -> None:
+    """The 29th of February is correct on leap years only."""
+    pytest.importorskip("numpy")
+    cfs = [body + check_char(body) for body in ("RSSMRA00B29H501", "RSSMRA01B29H501")]
+    assert bulk_verify(cfs) == [(True, False), (False, False)]
+
+
+def test_bulk_verify_without_numpy() -> None:
+    """Without NumPy every code is left to the single item analysis."""
+    cfs = ["RSSMRA99E05H501A", "RSSMRA99E05H50GP", " rssmra99e05h501a"]
+    with mock.patch("kofi.validator.np", None):
+        assert bulk_verify(cfs) == [None, None, None]
+        assert verify_many(cfs) == [(True, False), (True, True), (True, False)]
@@ -0,0 +1,49 @@
+# -*- encoding: utf-8 -*-
+"""Test the pre-fork supervisor."""
+
+from multiprocessing import Process
+import os
+import py  # type: ignore
+import signal
+import time
+
+from kofi.workers import Supervisor
+
+WORKERS = 2
+CRASHES = 3
+
+
+def wait_for_lines(path: py.path.local, count: int) -> None:
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        if path.exists() and len(path.read().splitlines()) >= count:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"Less than {count} workers started")
+
+
+def test_supervisor(tmpdir: py.path.local) -> None:
+    """Crashed workers are restarted, all of them stop with the master."""
+    started = tmpdir.join("started")
+
+    def target() -> None:
+        with open(started, "a") as f:
+            f.write(f"{os.getpid()}\n")
+        if len(started.read().splitlines()) <= CRASHES:
+            raise RuntimeError("crash")
+        signal.pause()
+
+    master = Process(target=Supervisor(WORKERS, target, restart_delay=0).run)
+    master.start()
+    wait_for_lines(started, CRASHES + WORKERS)
+    os.kill(master.pid, signal.SIGTERM)
+    master.join(10)
+    assert master.exitcode == 0
+    pids = [int(pid) for pid in started.read().splitlines()]
+    assert len(pids) == CRASHES + WORKERS
+    for pid in pids:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            continue
+        raise AssertionError(f"Worker {pid} is still alive")